@@ -1,18 +1,32 @@
 from Dependencies import constants as c
-import math
+# For the year arrays.
+import numpy as np
+# For the comparison frame.
+import pandas as pd
+# For the shared EROI equation.
+from Dependencies import functions as f
+# For checking arguments given by position as well as by keyword.
+import functools
+import inspect
+
 
 def validate_parameters(valid_resources, valid_prediction_types):
     """Decorator that ensures any functions in this section only use a valid resource and prediction type."""
 
     def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            resource = kwargs.get("resource")
-            prediction_type = kwargs.get("prediction_type")
+            arguments = signature.bind(*args, **kwargs)
+            arguments.apply_defaults()
+            resource = arguments.arguments.get("resource")
+            prediction_type = arguments.arguments.get("prediction_type")
             if resource not in valid_resources:
                 raise ValueError(f"Invalid resource: {resource}. Must be one of {valid_resources}.")
-            if prediction_type not in valid_prediction_types or prediction_type != "all" or prediction_type != "none":
+            if prediction_type not in valid_prediction_types and prediction_type not in ("all", "none"):
                 raise ValueError(
-                    f"Invalid prediction type: {prediction_type}. Must be one of {valid_prediction_types}.")
+                    f"Invalid prediction type: {prediction_type}. Must be one of {valid_prediction_types}, 'all' or 'none'.")
             return func(*args, **kwargs)
 
         return wrapper
@@ -20,72 +34,98 @@ def validate_parameters(valid_resources, valid_prediction_types):
     return decorator
 
 
+def _predictions(prediction_type):
+    """The predictions (l, b, h) covered by a prediction type. "none" uses the base prediction."""
+    if prediction_type == "all":
+        return list(c.valid_prediction_types)
+    if prediction_type == "none":
+        return ["b"]
+    return [prediction_type]
+
+
+def exploitation_ratio_cf(years, resources=None, predictions=None):
+    """
+    Court and Fizaine's time-based exploitation ratio, a logistic function of the year (see the legacy class below), for
+    every prediction, year, and resource at once.
+    :param years: A year or array of years.
+    :param resources: The resources, defaults to c.valid_resources.
+    :param predictions: The predictions, defaults to c.valid_prediction_types (l, b, h).
+    :return: A (predictions x years x resources) float64 array.
+    """
+    resources = resources or c.valid_resources
+    predictions = predictions or c.valid_prediction_types
+    years = np.atleast_1d(np.asarray(years, dtype=np.float64))
+    resource_dicts = [getattr(c, resource) for resource in resources]
+    delta = np.array([[resource_dict["delta"][prediction] for resource_dict in resource_dicts]
+                      for prediction in predictions], dtype=np.float64)[:, np.newaxis, :]
+    tlag = np.array([[resource_dict["tlag"][prediction] for resource_dict in resource_dicts]
+                     for prediction in predictions], dtype=np.float64)[:, np.newaxis, :]
+    return 1 / (1 + np.exp(-delta * (years[np.newaxis, :, np.newaxis] - c.base_year - tlag)))
+
+
+def court_fizaine_EROI(years, resources=None, predictions=None):
+    """
+    The EROI of each resource from Court and Fizaine's time-based exploitation ratio, for every prediction and year in
+    one call.
+    :param years: A year or array of years.
+    :param resources: The resources, defaults to c.valid_resources.
+    :param predictions: The predictions, defaults to c.valid_prediction_types (l, b, h).
+    :return: A dictionary of a (predictions x years) float64 array of EROI per resource.
+    """
+    resources = resources or c.valid_resources
+    expl_ratio = exploitation_ratio_cf(years, resources=resources, predictions=predictions)
+    EROI = f.fossil_EROI_eq(expl_ratio, [getattr(c, resource) for resource in resources])
+    return {resource: EROI[:, :, i] for i, resource in enumerate(resources)}
+
+
+def compare_EROI(EROI_results, predictions=None):
+    """
+    Lines up Court and Fizaine's time-based EROI with the adjusted EROI (functions.resource_fossil_EROI) by year.
+    :param EROI_results: The EROI results dataframe which includes the per year EROI for coal, gas, and oil.
+    :param predictions: The predictions to compare, defaults to c.valid_prediction_types (l, b, h).
+    :return: A pandas dataframe with the year, and per resource the adjusted EROI ("Coal EROI"), the time-based EROI per
+    prediction ("Coal CF EROI b"), and the time-based minus the adjusted EROI ("Coal CF EROI b diff").
+    """
+    predictions = predictions or c.valid_prediction_types
+    resources = ["Coal", "Gas", "Oil"]
+    years = EROI_results["Year"].to_numpy(dtype=np.float64)
+    cf_EROI = court_fizaine_EROI(years, resources=resources, predictions=predictions)
+
+    comparison = {"Year": EROI_results["Year"].to_numpy()}
+    for resource in resources:
+        adjusted = EROI_results[resource + " EROI"].to_numpy(dtype=np.float64)
+        comparison[resource + " EROI"] = adjusted
+        for i, prediction in enumerate(predictions):
+            comparison[f"{resource} CF EROI {prediction}"] = cf_EROI[resource][i]
+            comparison[f"{resource} CF EROI {prediction} diff"] = cf_EROI[resource][i] - adjusted
+    return pd.DataFrame(comparison)
+
+
 # LEGACY
 class CtFeEROI:
     """
     NOTE: This was written to model Court & Fizaine's work, but *was not used* in this thesis due to my
-    adjusted methodology. This has been kept in for potential replication and comparisons in the future.
+    adjusted methodology. This has been kept in for potential replication and comparisons in the future (see
+    compare_EROI).
     """
     @validate_parameters(c.valid_resources, c.valid_prediction_types)
     def __init__(self, resource, prediction_type="none"):
+        self.resource = resource
         self.resource_dict = getattr(c, resource)
         self.prediction_type = prediction_type
+        self.predictions = _predictions(prediction_type)
         self.base_year = c.base_year
 
     def exploitation_ratio_cf(self, year):
         """An estimate of the exploitation ratio of a fossil fuel calculated by and based on Court and Fizaine's historical
-        data. This follows a logistical growth/sigmoid function, and is used in the theoretical predictions of EROI."""
-
-        def _exploitation_ratio_eq(year, prediction):
-            return 1 + math.exp(
-                -self.resource_dict["delta"][prediction] * (
-                        year - self.base_year - self.resource_dict["tlag"][prediction]))
-
-        if self.prediction_type == "all":
-            exploitation_ratios = []
-            for prediction in c.valid_prediction_types:
-                exploitation_ratios += [_exploitation_ratio_eq(year, prediction)]
-            return exploitation_ratios
-        else:
-            return [_exploitation_ratio_eq(year, self.prediction_type)]
-
-    # def exploitation_ratio_adjusted(self, initial_year, current_year, dataset, year_column=0):
-    #     """An estimate of the exploitation ratio of a fossil fuel calculated by and based on Court and Fizaine's historical
-    #     data. This follows a logistical growth/sigmoid function, and is used in the theoretical predictions of EROI."""
-    #
-    #     def _exploitation_ratio_eq(year, initial_sum, total_sum):
-    #         return 1 + math.exp(
-    #             -self.resource_dict["delta"][prediction] * (
-    #                     year - self.base_year - self.resource_dict["tlag"][prediction]))
-    #
-    #     if self.prediction_type == "all":
-    #         exploitation_ratios = []
-    #         for prediction in c.valid_prediction_types:
-    #             exploitation_ratios += [_exploitation_ratio_eq(year, prediction)]
-    #         return exploitation_ratios
-    #     else:
-    #         return [_exploitation_ratio_eq(year, self.prediction_type)]
+        data. This follows a logistical growth/sigmoid function, and is used in the theoretical predictions of EROI.
+        :param year: A year or array of years.
+        :return: A (predictions x years) array, one row per prediction of the prediction type."""
+        return exploitation_ratio_cf(year, resources=[self.resource], predictions=self.predictions)[:, :, 0]
 
     def resource_fossil_EROI(self, year):
         """An estimate of the EROI of a given fossil resource (coal, oil, or gas) from Court and Fizaine's
-        predictions."""
-
-        def _resource_fossil_EROI_eq(resource_er_value):
-            return (((self.resource_dict["in"] +
-                      (1 - self.resource_dict["in"]) / (
-                              1 + math.exp(
-                          -self.resource_dict["tl"] * (resource_er_value - self.resource_dict["me"])))) *
-                     math.exp(self.resource_dict["rd"] * resource_er_value)) *
-                    self.resource_dict["sf"])
-
-        resource_fossil_EROIs = []
-        resource_er = self.exploitation_ratio(year)
-
-        if self.prediction_type == "none":
-            pass
-        if self.prediction_type == "all":
-            for prediction_er in resource_er:
-                resource_fossil_EROIs += [_resource_fossil_EROI_eq(prediction_er)]
-            return resource_fossil_EROIs
-        else:
-            return _resource_fossil_EROI_eq(resource_er)
+        predictions.
+        :param year: A year or array of years.
+        :return: A (predictions x years) array, one row per prediction of the prediction type."""
+        return court_fizaine_EROI(year, resources=[self.resource], predictions=self.predictions)[self.resource]
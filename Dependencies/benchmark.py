@@ -0,0 +1,238 @@
+# Benchmarks for the EROI calculations on synthetic GeRS-DeMo outputs. The real result workbooks have a fixed size, so
+# synthetic sheets with the same layout (metadata rows followed by a wide block of years, one column per mine/field) are
+# generated with configurable row counts, year spans, and mineral mixes. Each stage is timed and its peak memory
+# measured, and the results are appended to a JSON history so that versions can be compared.
+#
+# Run from the repository root, i.e.: python -m Dependencies.benchmark --rows 500 2000 --years 300 700
+
+# For the command line interface.
+import argparse
+# For the JSON history.
+import json
+import os
+import platform
+import subprocess
+import time
+# For measuring peak memory.
+import tracemalloc
+# For merging pandas dataframes together for a coordinated result.
+import functools
+# For general data preparation/wrangling.
+import pandas as pd
+# For the synthetic production curves.
+import numpy as np
+# General program functions
+from Dependencies import functions as f
+
+DEFAULT_HISTORY_LOC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Outputs",
+                                   "benchmark_history.json")
+DEFAULT_MINERAL_MIX = {"Coal": 0.26, "Gas": 0.40, "Oil": 0.34}
+METADATA_ROWS = ["continent", "country", "region", "subregion", "mineral", "submineral", "unit", "Model/Data"]
+CONTINENTS = ["Africa", "Asia", "Europe", "FSU", "Middle_East", "North_America", "South_America"]
+SUBMINERALS = {"Coal": ["Bituminous", "Lignite", "Sub-bituminous"], "Gas": ["Conventional", "Shale", "Tight"],
+               "Oil": ["Conventional", "Extra_Heavy", "Kerogen"]}
+
+
+def synthetic_results(n_rows=872, n_years=696, first_year=1710, mineral_mix=None, seed=0):
+    """
+    Generates a synthetic GeRS-DeMo output in the layout read by pd.read_excel(loc, sheet_name, header=None). Each
+    mine/field produces along a bell-shaped curve starting at a random year, and years without production are NA, as in
+    the model output.
+    :param n_rows: The number of mines/fields (the columns of the sheet, rows once cleaned).
+    :param n_years: The number of years.
+    :param first_year: The first year of the year block.
+    :param mineral_mix: The share of rows per mineral. Defaults to roughly the mix of the Base scenario.
+    :param seed: The seed of the random generator.
+    :return: A pandas dataframe in the layout of the original output.
+    """
+    rng = np.random.default_rng(seed)
+    mineral_mix = mineral_mix or DEFAULT_MINERAL_MIX
+    minerals = rng.choice(list(mineral_mix), size=n_rows, p=np.array(list(mineral_mix.values())) / sum(mineral_mix.values()))
+    continents = rng.choice(CONTINENTS, size=n_rows)
+    submineral = [rng.choice(SUBMINERALS.get(mineral, ["All"])) for mineral in minerals]
+
+    metadata = np.array([
+        continents,
+        [f"{continent}_{i % 20}" for i, continent in enumerate(continents)],
+        ["all"] * n_rows,
+        ["All"] * n_rows,
+        minerals,
+        submineral,
+        ["EJ/y"] * n_rows,
+        ["Model"] * n_rows
+    ], dtype=object)
+
+    # Production peaks somewhere after the start year and is cut off where it becomes negligible.
+    years = np.arange(n_years)[:, np.newaxis]
+    start = rng.uniform(0, n_years * 0.8, size=n_rows)
+    width = rng.uniform(10, 60, size=n_rows)
+    peak = rng.lognormal(-2, 1.5, size=n_rows)
+    production = peak * np.exp(-0.5 * ((years - start - 2 * width) / width) ** 2)
+    production[(years < start) | (production < 1e-6)] = np.nan
+
+    labels = np.array(METADATA_ROWS + list(range(first_year, first_year + n_years)), dtype=object)[:, np.newaxis]
+    return pd.DataFrame(np.hstack([labels, np.vstack([metadata, production.astype(object)])]))
+
+
+def _stages(direct_output):
+    """The pipeline stages in order, each a name and a function of the previous results."""
+    return [
+        ("gersdemo_prepare_results", lambda r: f.gersdemo_prepare_results(direct_output)),
+        ("production", lambda r: f.gersdemo_prod_results(r["gersdemo_prepare_results"], clean=False)),
+        ("summed", lambda r: f.gersdemo_summed_results(r["gersdemo_prepare_results"], clean=False)),
+        ("exploitation_ratio", lambda r: f.exploitation_ratio_adjusted(r["summed"])),
+        ("EROI", lambda r: f.resource_fossil_EROI(r["exploitation_ratio"])),
+        ("net_energy", lambda r: f.net_energy_results(r["gersdemo_prepare_results"], r["EROI"], clean=False)),
+        ("net_production", lambda r: f.gersdemo_prod_results(r["net_energy"], clean=False)),
+        ("merge", lambda r: functools.reduce(lambda left, right: pd.merge(left, right, on='Year'),
+                                             [r["production"], r["net_production"], r["EROI"]]))
+    ]
+
+
+def benchmark_stages(direct_output, repeat=3):
+    """
+    Times each stage of the pipeline and measures its peak memory.
+    :param direct_output: A GeRS-DeMo output in the layout of the original output (see synthetic_results).
+    :param repeat: The number of timed runs. The fastest is reported, and the peak memory comes from a separate traced run
+    so that tracing does not slow down the timings.
+    :return: A dictionary per stage of the wall time in seconds and the peak memory in bytes.
+    """
+    stages = _stages(direct_output)
+    wall_times = {name: float("inf") for name, _ in stages}
+    for _ in range(repeat):
+        results = {}
+        for name, stage in stages:
+            start = time.perf_counter()
+            results[name] = stage(results)
+            wall_times[name] = min(wall_times[name], time.perf_counter() - start)
+
+    peak_memory = {}
+    results = {}
+    tracemalloc.start()
+    try:
+        for name, stage in stages:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            results[name] = stage(results)
+            peak_memory[name] = tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+
+    return {name: {"wall_time": wall_times[name], "peak_memory": peak_memory[name]} for name, _ in stages}
+
+
+def _git_commit():
+    """The current git commit, if the benchmark runs inside the repository."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_benchmarks(rows=(872,), years=(696,), mineral_mix=None, repeat=3, history_loc=DEFAULT_HISTORY_LOC, label=None,
+                   verbose=True):
+    """
+    Benchmarks every stage over every combination of sizes and appends the results to the JSON history.
+    :param rows: The row counts to benchmark.
+    :param years: The year spans to benchmark.
+    :param mineral_mix: The share of rows per mineral (see synthetic_results).
+    :param repeat: The number of timed runs per size (see benchmark_stages).
+    :param history_loc: The location of the JSON history. None skips saving.
+    :param label: An optional label for the run (i.e. the change being measured).
+    :param verbose: Indicates whether the results should be printed.
+    :return: The record of the run that was added to the history.
+    """
+    record = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "label": label,
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "machine": platform.platform(),
+        "results": []
+    }
+    for n_rows in rows:
+        for n_years in years:
+            stages = benchmark_stages(synthetic_results(n_rows, n_years, mineral_mix=mineral_mix), repeat=repeat)
+            record["results"].append({"rows": n_rows, "years": n_years, "stages": stages})
+            if verbose:
+                print(f"{n_rows} rows x {n_years} years:")
+                for name, stage in stages.items():
+                    print(f"    {name:<26}{stage['wall_time'] * 1000:>10.2f}ms{stage['peak_memory'] / 1024 ** 2:>10.2f}MB")
+
+    if history_loc is not None:
+        history = load_history(history_loc)
+        history.append(record)
+        os.makedirs(os.path.dirname(os.path.abspath(history_loc)), exist_ok=True)
+        with open(history_loc, "w") as file:
+            json.dump(history, file, indent=1)
+    return record
+
+
+def load_history(history_loc=DEFAULT_HISTORY_LOC):
+    """
+    The benchmark history.
+    :param history_loc: The location of the JSON history.
+    :return: A list of run records, oldest first.
+    """
+    if not os.path.isfile(history_loc):
+        return []
+    with open(history_loc) as file:
+        return json.load(file)
+
+
+def compare_runs(history_loc=DEFAULT_HISTORY_LOC, baseline=-2, current=-1):
+    """
+    Compares two runs of the history per size and stage.
+    :param history_loc: The location of the JSON history.
+    :param baseline: The index of the baseline run in the history.
+    :param current: The index of the compared run in the history.
+    :return: A pandas dataframe with the rows, years, stage, both wall times and peak memories, and the ratio of the
+    current over the baseline wall time (above 1 is a regression).
+    """
+    history = load_history(history_loc)
+    rows = []
+    baseline_results = {(result["rows"], result["years"]): result["stages"] for result in history[baseline]["results"]}
+    for result in history[current]["results"]:
+        baseline_stages = baseline_results.get((result["rows"], result["years"]))
+        if baseline_stages is None:
+            continue
+        for name, stage in result["stages"].items():
+            if name not in baseline_stages:
+                continue
+            rows.append({
+                "rows": result["rows"],
+                "years": result["years"],
+                "stage": name,
+                "baseline wall_time": baseline_stages[name]["wall_time"],
+                "wall_time": stage["wall_time"],
+                "baseline peak_memory": baseline_stages[name]["peak_memory"],
+                "peak_memory": stage["peak_memory"],
+                "ratio": stage["wall_time"] / baseline_stages[name]["wall_time"]
+            })
+    return pd.DataFrame(rows)
+
+
+def _parse_mineral_mix(value):
+    """Parses a mineral mix such as Coal=0.3,Gas=0.4,Oil=0.3."""
+    return {name: float(share) for name, share in (item.split("=") for item in value.split(","))}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the EROI calculations on synthetic GeRS-DeMo outputs.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[872], help="Row counts (mines/fields) to benchmark.")
+    parser.add_argument("--years", type=int, nargs="+", default=[696], help="Year spans to benchmark.")
+    parser.add_argument("--minerals", type=_parse_mineral_mix, default=None,
+                        help="Share of rows per mineral, i.e. Coal=0.3,Gas=0.4,Oil=0.3.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per size; the fastest is kept.")
+    parser.add_argument("--history", default=DEFAULT_HISTORY_LOC, help="Location of the JSON history.")
+    parser.add_argument("--label", default=None, help="Label stored with the run.")
+    parser.add_argument("--compare", action="store_true", help="Print the comparison with the previous run.")
+    arguments = parser.parse_args()
+
+    run_benchmarks(arguments.rows, arguments.years, mineral_mix=arguments.minerals, repeat=arguments.repeat,
+                   history_loc=arguments.history, label=arguments.label)
+    if arguments.compare and len(load_history(arguments.history)) > 1:
+        print(compare_runs(arguments.history).to_string(index=False))
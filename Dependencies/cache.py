@@ -0,0 +1,298 @@
+# On-disk cache for cleaned GeRS-DeMo results. Parsing the result workbooks with openpyxl is slower than the rest of the
+# EROI calculations, so the cleaned wide dataframe is stored once in a binary columnar form: the year block as a single
+# contiguous float64 array (.npy, loaded through memory-mapping) and the metadata columns as a small JSON table.
+# Entries are keyed on the workbook contents, the sheet, and the cleaning options, and the oldest used entries are
+# removed once the cache grows past its size limit. Smaller typed tables (i.e. the mines and fields of an input
+# workbook, see urr.py) are stored with store_table, which keeps the dtype of each column.
+
+# For hashing the workbook contents into a cache key.
+import hashlib
+# For the metadata table and entry information.
+import json
+# For the cache directory and entries.
+import os
+import shutil
+import tempfile
+import time
+# For general data preparation/wrangling.
+import pandas as pd
+# For the contiguous year block.
+import numpy as np
+# For returning entries without building a dataframe.
+from Dependencies.compact import CompactResults
+
+# Bump when the layout of an entry changes so that old entries are never read.
+CACHE_VERSION = 1
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".gersdemo_cache")
+DEFAULT_MAX_BYTES = 512 * 1024 ** 2
+
+_VALUES_FILE = "values.npy"
+_META_FILE = "meta.json"
+_ENTRY_FILE = "entry.json"
+_TABLE_FILE = "table.npz"
+
+
+def workbook_hash(loc, chunk_size=1024 ** 2):
+    """
+    The SHA-256 hash of a workbook's contents. Used so that edited workbooks never reuse an old entry, even if the file
+    name is the same.
+    :param loc: The location of the workbook in the files.
+    :param chunk_size: The number of bytes read at a time.
+    :return: The hex digest of the contents.
+    """
+    digest = hashlib.sha256()
+    with open(loc, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_key(content_hash, sheet_name, **options):
+    """
+    The cache key of a cleaned sheet.
+    :param content_hash: The hash of the data the frame was made from (see workbook_hash).
+    :param sheet_name: The name of the sheet (i.e. Dynamic_BG for Dynamic_BG_results).
+    :param options: Any cleaning options which change the stored frame.
+    :return: The key as a hex string.
+    """
+    key_parts = {"version": CACHE_VERSION, "hash": content_hash, "sheet": sheet_name, "options": options}
+    return hashlib.sha256(json.dumps(key_parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def load_frame(key, cache_dir=DEFAULT_CACHE_DIR, compact=False):
+    """
+    Loads a cleaned frame from the cache. The year block is memory-mapped rather than read into memory up front.
+    :param key: The cache key (see cache_key).
+    :param cache_dir: The directory holding the cache entries.
+    :param compact: Indicates whether a CompactResults should be returned, which keeps the memory-mapped year block as is.
+    :return: The cleaned pandas dataframe (or CompactResults), or None if there is no entry for the key.
+    """
+    entry_dir = os.path.join(cache_dir, key)
+    try:
+        with open(os.path.join(entry_dir, _META_FILE)) as file:
+            meta = json.load(file)
+        year_block = np.load(os.path.join(entry_dir, _VALUES_FILE), mmap_mode="r")
+    except (FileNotFoundError, ValueError):
+        return None
+
+    # Marks the entry as recently used for the size-bounded eviction.
+    os.utime(os.path.join(entry_dir, _ENTRY_FILE))
+
+    return _entry_frame(meta, year_block, compact=compact)
+
+
+def normalize_frame(results_df, first_col_index):
+    """
+    A cleaned frame as load_frame returns it once stored (float64 year columns, metadata columns as read back from
+    JSON), so that results are the same whether or not they came from the cache.
+    :param results_df: A cleaned pandas dataframe of the outputted results.
+    :param first_col_index: The index of the first year column (see functions.gersdemo_year_columns).
+    :return: The normalized pandas dataframe.
+    """
+    meta, year_block = _frame_entry(results_df, first_col_index)
+    return _entry_frame(json.loads(json.dumps(meta)), year_block)
+
+
+def _frame_entry(results_df, first_col_index):
+    """The metadata (as JSON values) and the contiguous float64 year block of a cleaned frame."""
+    meta_df = results_df.iloc[:, :first_col_index]
+    meta = {
+        "names": [str(name) for name in meta_df.columns],
+        "columns": meta_df.astype(object).values.tolist(),
+        "years": [_json_label(year) for year in results_df.columns[first_col_index:]]
+    }
+    return meta, np.ascontiguousarray(results_df.iloc[:, first_col_index:].to_numpy(dtype=np.float64))
+
+
+def _entry_frame(meta, year_block, compact=False):
+    """The cleaned frame (or CompactResults) of an entry's metadata and year block."""
+    meta_df = pd.DataFrame(meta["columns"], columns=meta["names"])
+    if compact:
+        return CompactResults(meta_df.astype("category"), year_block, meta["years"])
+    year_df = pd.DataFrame(year_block, columns=meta["years"])
+    return pd.concat([meta_df, year_df], axis=1)
+
+
+def store_frame(key, results_df, first_col_index, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES,
+                **info):
+    """
+    Stores a cleaned frame in the cache, then evicts the least recently used entries past max_bytes.
+    :param key: The cache key (see cache_key).
+    :param results_df: A cleaned pandas dataframe of the outputted results.
+    :param first_col_index: The index of the first year column (see functions.gersdemo_year_columns).
+    :param cache_dir: The directory holding the cache entries.
+    :param max_bytes: The maximum total size of the cache. None disables eviction.
+    :param info: Extra information stored alongside the entry (i.e. the workbook location), used by invalidate.
+    :return: The location of the stored entry.
+    """
+    meta, year_block = _frame_entry(results_df, first_col_index)
+    return _store_entry(key, meta, {_VALUES_FILE: year_block}, cache_dir, max_bytes, info)
+
+
+def load_table(key, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Loads a typed table from the cache (see store_table).
+    :param key: The cache key (see cache_key).
+    :param cache_dir: The directory holding the cache entries.
+    :return: The pandas dataframe with the dtypes it was stored with, or None if there is no entry for the key.
+    """
+    entry_dir = os.path.join(cache_dir, key)
+    try:
+        with open(os.path.join(entry_dir, _META_FILE)) as file:
+            meta = json.load(file)
+        with np.load(os.path.join(entry_dir, _TABLE_FILE)) as arrays:
+            arrays = dict(arrays)
+    except (FileNotFoundError, ValueError):
+        return None
+
+    # Marks the entry as recently used for the size-bounded eviction.
+    os.utime(os.path.join(entry_dir, _ENTRY_FILE))
+
+    columns = {}
+    for i, (name, dtype) in enumerate(zip(meta["names"], meta["dtypes"])):
+        if str(i) in meta["text"]:
+            column = pd.Series(meta["text"][str(i)], dtype=object)
+            columns[name] = column if dtype == "object" else column.astype(dtype)
+        else:
+            column = pd.Series(arrays[f"{i}"]).astype(dtype)
+            # Nullable columns store their NA values as a separate mask.
+            columns[name] = column.mask(arrays[f"{i}_mask"]) if f"{i}_mask" in arrays else column
+    return pd.DataFrame(columns)
+
+
+def store_table(key, table, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, **info):
+    """
+    Stores a typed table (i.e. the mines and fields of an input workbook) in the cache, keeping the dtype of each column:
+    numeric columns as arrays, with a mask for the NA values of nullable columns (i.e. Int64), and every other column
+    (text, categorical) as a JSON list. The least recently used entries past max_bytes are then evicted.
+    :param key: The cache key (see cache_key).
+    :param table: A pandas dataframe.
+    :param cache_dir: The directory holding the cache entries.
+    :param max_bytes: The maximum total size of the cache. None disables eviction.
+    :param info: Extra information stored alongside the entry (i.e. the workbook location), used by invalidate.
+    :return: The location of the stored entry.
+    """
+    meta = {"names": [_json_label(name) for name in table.columns], "dtypes": [], "text": {}}
+    arrays = {}
+    for i, (name, column) in enumerate(table.items()):
+        meta["dtypes"].append(str(column.dtype))
+        if not pd.api.types.is_numeric_dtype(column.dtype):
+            meta["text"][str(i)] = [None if pd.isna(value) else _json_label(value) for value in column.astype(object)]
+        elif isinstance(column.dtype, pd.api.extensions.ExtensionDtype):
+            arrays[f"{i}"] = column.to_numpy(dtype=column.dtype.numpy_dtype, na_value=0)
+            arrays[f"{i}_mask"] = column.isna().to_numpy()
+        else:
+            arrays[f"{i}"] = column.to_numpy()
+    return _store_entry(key, meta, {_TABLE_FILE: arrays}, cache_dir, max_bytes, info)
+
+
+def _store_entry(key, meta, arrays, cache_dir, max_bytes, info):
+    """
+    Writes an entry (its metadata, arrays, and entry information) to the cache, then evicts the least recently used
+    entries past max_bytes.
+    :param arrays: A dictionary of file name to an array (saved as .npy) or a dictionary of arrays (saved as .npz).
+    :return: The location of the stored entry.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+
+    # Written into a temporary directory first and then renamed, so other processes never see a partial entry.
+    entry_dir = os.path.join(cache_dir, key)
+    temp_dir = tempfile.mkdtemp(dir=cache_dir, prefix=".tmp-")
+    try:
+        for file_name, values in arrays.items():
+            if isinstance(values, dict):
+                np.savez(os.path.join(temp_dir, file_name), **values)
+            else:
+                np.save(os.path.join(temp_dir, file_name), values)
+        with open(os.path.join(temp_dir, _META_FILE), "w") as file:
+            json.dump(meta, file)
+        with open(os.path.join(temp_dir, _ENTRY_FILE), "w") as file:
+            json.dump(dict(info, key=key, created=time.time()), file, default=str)
+        if os.path.isdir(entry_dir):
+            shutil.rmtree(entry_dir, ignore_errors=True)
+        os.replace(temp_dir, entry_dir)
+    except OSError:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        # Another process stored the same entry first.
+        if not os.path.isdir(entry_dir):
+            raise
+
+    if max_bytes is not None:
+        evict(max_bytes, cache_dir=cache_dir, keep=[key])
+    return entry_dir
+
+
+def _json_label(label):
+    """Column labels as JSON values, so that integer years stay integers."""
+    if isinstance(label, np.generic):
+        return label.item()
+    return label
+
+
+def _entry_size(entry_dir):
+    """The size of an entry on disk in bytes."""
+    return sum(os.path.getsize(os.path.join(entry_dir, name)) for name in os.listdir(entry_dir))
+
+
+def list_entries(cache_dir=DEFAULT_CACHE_DIR):
+    """
+    The entries currently in the cache.
+    :param cache_dir: The directory holding the cache entries.
+    :return: A list of dictionaries with the stored entry information, its size in bytes, and when it was last used.
+    """
+    entries = []
+    if not os.path.isdir(cache_dir):
+        return entries
+    for key in os.listdir(cache_dir):
+        entry_file = os.path.join(cache_dir, key, _ENTRY_FILE)
+        try:
+            with open(entry_file) as file:
+                entry = json.load(file)
+            entry.update(size=_entry_size(os.path.join(cache_dir, key)), last_used=os.path.getmtime(entry_file))
+        except (FileNotFoundError, NotADirectoryError, ValueError):
+            continue
+        entries.append(entry)
+    return entries
+
+
+def evict(max_bytes=DEFAULT_MAX_BYTES, cache_dir=DEFAULT_CACHE_DIR, keep=()):
+    """
+    Removes the least recently used entries until the cache fits in max_bytes.
+    :param max_bytes: The maximum total size of the cache.
+    :param cache_dir: The directory holding the cache entries.
+    :param keep: Keys which are never removed (i.e. the entry that was just stored).
+    :return: The number of entries removed.
+    """
+    entries = sorted(list_entries(cache_dir), key=lambda entry: entry["last_used"])
+    total_size = sum(entry["size"] for entry in entries)
+    removed = 0
+    for entry in entries:
+        if total_size <= max_bytes:
+            break
+        if entry["key"] in keep:
+            continue
+        shutil.rmtree(os.path.join(cache_dir, entry["key"]), ignore_errors=True)
+        total_size -= entry["size"]
+        removed += 1
+    return removed
+
+
+def invalidate(loc=None, sheet_name=None, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Removes entries from the cache.
+    :param loc: The location of a workbook whose entries should be removed. Matches both entries stored from this
+    location and entries of its current contents. None removes every entry.
+    :param sheet_name: Only remove the entries of this sheet.
+    :param cache_dir: The directory holding the cache entries.
+    :return: The number of entries removed.
+    """
+    content_hash = workbook_hash(loc) if loc is not None and os.path.isfile(loc) else None
+    removed = 0
+    for entry in list_entries(cache_dir):
+        if loc is not None and entry.get("loc") != os.path.abspath(loc) and entry.get("hash") != content_hash:
+            continue
+        if sheet_name is not None and entry.get("sheet") != sheet_name:
+            continue
+        shutil.rmtree(os.path.join(cache_dir, entry["key"]), ignore_errors=True)
+        removed += 1
+    return removed
@@ -0,0 +1,89 @@
+# A compact representation of cleaned GeRS-DeMo datasets. gersdemo_prepare_results transposes a sheet of mixed headers
+# and numbers, so every year column of a cleaned dataframe is an object column of boxed Python floats. Here the metadata
+# columns are kept as categoricals and the year block as one contiguous 2-D numeric array, which the functions in
+# functions.py use directly instead of converting the year columns on every call.
+#
+# float32 mode: each production value is stored with a relative rounding error of at most 2^-24 (about 6e-8). The
+# pipeline sums in float64 and production is never negative, so the summed production keeps that bound and the EROI
+# moves by far less (about 3e-9 on the bundled scenarios). Net energy is stored in float32 again, which adds a second
+# rounding, and the EROI error is scaled by 1/(EROI - 1) in the net energy multiplier. The net energy of each mine/field
+# therefore stays within about 2^-23 (1.2e-7) of the float64 results, more for years with an EROI close to 1 (up to
+# 1.6e-7, or 2.75 * 2^-24, on the Base scenario). The summed net energy averages these out and stays within 1.3e-7.
+
+# For general data preparation/wrangling.
+import pandas as pd
+# For the year block.
+import numpy as np
+
+# The relative rounding error of a production value stored in float32, see above.
+FLOAT32_RELATIVE_ERROR = 2.0 ** -24
+
+
+class CompactResults:
+    """
+    A cleaned GeRS-DeMo dataset held as categorical metadata columns and a contiguous (rows x years) numeric array.
+    """
+
+    def __init__(self, metadata, values, years):
+        """
+        :param metadata: A pandas dataframe of the metadata columns (continent, country, region, subregion, mineral, submineral, unit, Model/Data).
+        :param values: A (rows x years) numeric array of production. It is used as is, without copying.
+        :param years: The year column labels.
+        """
+        if values.ndim != 2 or values.shape != (len(metadata), len(years)):
+            raise ValueError(f"The year block must be (rows x years) = ({len(metadata)}, {len(years)}), got {values.shape}.")
+        self.metadata = metadata.reset_index(drop=True)
+        self.values = values
+        self.years = pd.Index(years)
+
+    @classmethod
+    def from_frame(cls, results_df, first_col_index, dtype=np.float64):
+        """
+        Converts a cleaned dataframe into the compact representation.
+        :param results_df: A cleaned pandas dataframe of the outputted results (see gersdemo_prepare_results).
+        :param first_col_index: The index of the first year column (see gersdemo_year_columns).
+        :param dtype: The dtype of the year block, np.float64 or np.float32 (see the error bound above).
+        :return: The CompactResults.
+        """
+        metadata = results_df.iloc[:, :first_col_index].astype("category")
+        values = np.ascontiguousarray(results_df.iloc[:, first_col_index:].to_numpy(dtype=dtype))
+        return cls(metadata, values, results_df.columns[first_col_index:])
+
+    def to_frame(self):
+        """
+        :return: The dataset as a cleaned pandas dataframe, with plain metadata columns and float year columns.
+        """
+        metadata = self.metadata.apply(lambda column: column.astype(object))
+        return pd.concat([metadata, pd.DataFrame(self.values, columns=self.years)], axis=1)
+
+    def __getitem__(self, column):
+        """A metadata column by name (i.e. results["mineral"])."""
+        return self.metadata[column]
+
+    def __len__(self):
+        return len(self.metadata)
+
+    @property
+    def columns(self):
+        return self.metadata.columns.append(self.years)
+
+    @property
+    def shape(self):
+        return len(self.metadata), len(self.metadata.columns) + len(self.years)
+
+    def rows(self, mask):
+        """
+        A subset of rows, i.e. results.rows(results["continent"] == "Africa").
+        :param mask: A boolean array or series with one value per row.
+        :return: The CompactResults of the selected rows.
+        """
+        mask = np.asarray(mask, dtype=bool)
+        if mask.all():
+            return self
+        return CompactResults(self.metadata[mask], self.values[mask], self.years)
+
+    def memory_usage(self):
+        """
+        :return: The memory held by the metadata and the year block in bytes.
+        """
+        return int(self.metadata.memory_usage(deep=True).sum()) + self.values.nbytes
@@ -10,9 +10,24 @@ import pandas as pd
 from Dependencies import constants as c
 # For numpy exponential functions
 import numpy as np
+# For the locations of cached workbooks.
+import os
+# For fingerprinting the inputs of each calculation.
+import hashlib
+import json
 # For merging pandas dataframes together for a coordinated result.
 import functools
+# For caching the cleaned result workbooks between runs.
+from Dependencies import cache
+# For opt-in timings of each stage.
+from Dependencies.instrumentation import instrumented
+# For the compact (categorical metadata and contiguous year array) form of cleaned datasets.
+from Dependencies.compact import CompactResults
 
+# The Court and Fizaine constants read by the EROI equation (see fossil_EROI_eq).
+EROI_CONSTANTS = ["sf", "in", "tl", "me", "rd"]
+
+@instrumented("gersdemo_prepare_results")
 def gersdemo_prepare_results(results_df):
     """
     Preforms the initial data-sorting work on the file outputted from GeRS-DeMO.
@@ -27,33 +42,102 @@ def gersdemo_prepare_results(results_df):
     return results_df
 
 
-def gersdemo_pre_prod_calc(results_df, clean=True, name_adj="", prod_type=""):
+@instrumented("gersdemo_year_columns")
+def gersdemo_year_columns(results_df):
     """
-    Preparatory code that is shared between the PER YEAR and SUMMED YEARS production calculations for coal, gas, and oil.
-    :param prod_type: The type of production to add onto the output frame. For this code, either " Prod" or " Sum Prod".
+    Locates the block of year columns in a cleaned GeRS-DeMo dataframe.
+    :param results_df: A cleaned pandas dataframe of the outputted results (see gersdemo_prepare_results), or a CompactResults.
+    :return: The index of the first year column and the year column labels.
+    """
+    if isinstance(results_df, CompactResults):
+        return len(results_df.metadata.columns), results_df.years
+
+    # Finding the first numeric column in the dataset, then getting its location. This is done to ensure that, if a change was made to the dataframe, the code would still start at the first year of production XXXX. Columns are checked one at a time so that only the metadata columns (and the first year) are ever coerced.
+    first_col_index = 0
+    for i in range(len(results_df.columns)):
+        column = results_df.iloc[:, i]
+        if not pd.api.types.is_numeric_dtype(column):
+            column = pd.to_numeric(column, errors='coerce')
+        if column.notna().any():
+            first_col_index = i
+            break
+    years = results_df.columns[first_col_index:]
+    return first_col_index, years
+
+
+def gersdemo_year_block(results_df):
+    """
+    Splits a cleaned GeRS-DeMo dataset into its metadata and its year block.
+    :param results_df: A cleaned pandas dataframe of the outputted results, or a CompactResults. The year block of a CompactResults is returned as is, without copying.
+    :return: The metadata dataframe, the year column labels, and the (rows x years) production array.
+    """
+    if isinstance(results_df, CompactResults):
+        return results_df.metadata, results_df.years, results_df.values
+    first_col_index, years = gersdemo_year_columns(results_df)
+    return (results_df.iloc[:, :first_col_index], years,
+            results_df.iloc[:, first_col_index:].to_numpy(dtype=np.float64))
+
+
+def compact_results(results_df, dtype=np.float64, clean=False):
+    """
+    Converts a GeRS-DeMo dataset into the compact form (see compact.py), which all the production, net energy, and regional calculations accept.
     :param results_df: A pandas dataframe of the outputted results.
+    :param dtype: The dtype of the year block, np.float64 or np.float32 (see compact.FLOAT32_RELATIVE_ERROR).
     :param clean: Indicates whether the results_df should be cleaned with gersdemo_prepare_results. Do this if you just got an output from the model.
-    :param name_adj: An adjustment to the column name (i.e. "German Coal Prod" instead of "Coal Prod"). Does not include a space.
-    :return: A list of outputs necessary for the calculation of coal, gas, and oil production alongside the base output dataframe.
+    :return: The CompactResults.
     """
-    # Results setup. Done to create a cleaned dataframe that puts the columns as the attributes and years, and that changes all NA values to 0, since the model outputs no production as NA.
+    if isinstance(results_df, CompactResults):
+        if results_df.values.dtype == dtype:
+            return results_df
+        return CompactResults(results_df.metadata, results_df.values.astype(dtype), results_df.years)
     if clean:
         results_df = gersdemo_prepare_results(results_df)
+    first_col_index, _ = gersdemo_year_columns(results_df)
+    return CompactResults.from_frame(results_df, first_col_index, dtype=dtype)
 
-    # An output dataframe which includes the year and production for coal, gas, and oil. Done to allow for easier summation mathematics.
-    output_df = pd.DataFrame(
-        columns=["Year", name_adj + "Coal" + prod_type, name_adj + "Gas" + prod_type, name_adj + "Oil" + prod_type])
 
-    # Finding the first numeric column in the dataset, then getting its location. This is done to ensure that, if a change was made to the dataframe, the code would still start at the first year of production XXXX.
-    first_numeric_col = results_df.apply(pd.to_numeric, errors='coerce').notna().any().idxmax()
-    first_col_index = results_df.columns.get_loc(first_numeric_col)
-    years = results_df.columns[first_col_index:]
+@instrumented("gersdemo_aggregate_results")
+def gersdemo_aggregate_results(results_df, clean=True, name_adj="", prod_type=" Prod", cumulative=False):
+    """
+    The single-pass aggregation engine behind the PER YEAR and SUMMED YEARS production results. The whole year block is
+    summed per mineral in one pass, and optionally accumulated along the year axis.
+    :param results_df: A pandas dataframe of the outputted results, or a CompactResults.
+    :param clean: Indicates whether the results_df should be cleaned with gersdemo_prepare_results. Do this if you just got an output from the model. Ignored for a CompactResults, which is always clean.
+    :param name_adj: An adjustment to the column name (i.e. "German Coal Prod" instead of "Coal Prod"). Does not include a space.
+    :param prod_type: The type of production to add onto the output frame. For this code, either " Prod" or " Sum Prod".
+    :param cumulative: Indicates whether each year should include the production of all prior years (SUMMED YEARS).
+    :return: A pandas dataframe with the year and individual coal, gas, and oil production results.
+    """
+    if clean and not isinstance(results_df, CompactResults):
+        results_df = gersdemo_prepare_results(results_df)
+    metadata, years, year_block = gersdemo_year_block(results_df)
+
+    # The year block as a single float array, summed per mineral. Minerals missing from the dataframe (i.e. a continent without any oil fields) are kept as zero production.
+    # The sums are always accumulated in float64, so a float32 year block only adds its storage rounding (see compact.py). NA values (i.e. net energy of a mineral without any production, whose EROI is NA) are skipped.
+    minerals = metadata['mineral'].to_numpy(dtype=object)
+    mineral_totals = np.stack([np.nansum(year_block[minerals == mineral], axis=0, dtype=np.float64)
+                               for mineral in ["Coal", "Gas", "Oil"]])
+    if cumulative:
+        mineral_totals = np.cumsum(mineral_totals, axis=1)
 
-    coal_data = results_df[results_df['mineral'] == 'Coal']
-    gas_data = results_df[results_df['mineral'] == 'Gas']
-    oil_data = results_df[results_df['mineral'] == 'Oil']
+    return mineral_totals_frame(years, mineral_totals, name_adj=name_adj, prod_type=prod_type)
 
-    return first_col_index, years, coal_data, gas_data, oil_data, output_df
+
+def mineral_totals_frame(years, mineral_totals, name_adj="", prod_type=" Prod"):
+    """
+    The production results frame of per mineral totals.
+    :param years: The year labels.
+    :param mineral_totals: A (3 x years) array of coal, gas, and oil production.
+    :param name_adj: An adjustment to the column name (i.e. "German Coal Prod" instead of "Coal Prod"). Does not include a space.
+    :param prod_type: The type of production to add onto the output frame. For this code, either " Prod" or " Sum Prod".
+    :return: A pandas dataframe with the year and individual coal, gas, and oil production results.
+    """
+    return pd.DataFrame({
+        "Year": [int(float(year)) for year in years],
+        name_adj + "Coal" + prod_type: mineral_totals[0],
+        name_adj + "Gas" + prod_type: mineral_totals[1],
+        name_adj + "Oil" + prod_type: mineral_totals[2]
+    })
 
 
 def gersdemo_prod_results(results_df, clean=True, name_adj=""):
@@ -65,25 +149,7 @@ def gersdemo_prod_results(results_df, clean=True, name_adj=""):
     :param name_adj: An adjustment to the column name (i.e. "German Coal Prod" instead of "Coal Prod"). Does not include a space.
     :return: A pandas dataframe with the year and individual coal, gas, and oil production results.
     """
-    prod_type = " Prod"
-    first_col_index, years, coal_data, gas_data, oil_data, output_df = gersdemo_pre_prod_calc(prod_type=prod_type,
-                                                                                              results_df=results_df,
-                                                                                              clean=clean,
-                                                                                              name_adj=name_adj)
-
-    # Loops through each year in the total model years, creates a year dataframe, and then concats that onto the output dataframe. This is done to allow for easy summation per year, where each year is the sum of it and the previous years production.
-    for i, year in enumerate(years):
-        i_adj = i + first_col_index
-
-        year_prod = pd.DataFrame.from_dict({
-            "Year": [int(year)],
-            name_adj + "Coal" + prod_type: [coal_data.iloc[:, i_adj].sum()],
-            name_adj + "Gas" + prod_type: [gas_data.iloc[:, i_adj].sum()],
-            name_adj + "Oil" + prod_type: [oil_data.iloc[:, i_adj].sum()]
-        })
-        output_df = pd.concat([output_df, year_prod], ignore_index=True)
-
-    return output_df
+    return gersdemo_aggregate_results(results_df, clean=clean, name_adj=name_adj, prod_type=" Prod")
 
 
 def gersdemo_summed_results(results_df, clean=True, name_adj=""):
@@ -94,131 +160,460 @@ def gersdemo_summed_results(results_df, clean=True, name_adj=""):
     :param name_adj: An adjustment to the column name (i.e. "German Coal Prod" instead of "Coal Prod"). Does not include a space.
     :return: A pandas dataframe with the year and individual coal, gas, and oil production results.
     """
-    prod_type = " Sum Prod"
-    first_col_index, years, coal_data, gas_data, oil_data, output_df = gersdemo_pre_prod_calc(prod_type=prod_type,
-                                                                                              results_df=results_df,
-                                                                                              clean=clean,
-                                                                                              name_adj=name_adj)
-
-    # Initializing cumulative sums and dataframes for Coal, Gas, and Oil, since there three need to be seperated before column summation.
-    coal_cumsum = 0
-    gas_cumsum = 0
-    oil_cumsum = 0
-
-    # Loops through each year in the total model years, creates a year dataframe, and then concats that onto the output dataframe. This is done to allow for easy summation per year, where each year is the sum of it and the previous years production.
-    for i, year in enumerate(years):
-        i_adj = i + first_col_index
-        coal_cumsum += coal_data.iloc[:, i_adj].sum()
-        gas_cumsum += gas_data.iloc[:, i_adj].sum()
-        oil_cumsum += oil_data.iloc[:, i_adj].sum()
-
-        year_prod = pd.DataFrame.from_dict({
-            "Year": [int(year)],
-            name_adj + "Coal" + prod_type: [coal_cumsum],
-            name_adj + "Gas" + prod_type: [gas_cumsum],
-            name_adj + "Oil" + prod_type: [oil_cumsum]
-        })
-        output_df = pd.concat([output_df, year_prod], ignore_index=True)
+    return gersdemo_aggregate_results(results_df, clean=clean, name_adj=name_adj, prod_type=" Sum Prod",
+                                      cumulative=True)
+
+@instrumented("fossil_EROI_kernel")
+def fossil_EROI_kernel(sum_prod, resource_dicts=None):
+    """
+    The array form of the adjusted exploitation ratio (4.14 in the thesis) and the Court and Fizaine EROI equation (Sec 4.1.1
+    and 4.3), calculated for all years and resources at once.
+    :param sum_prod: A (years x resources) array of SUMMED YEARS production, with one row per consecutive year.
+    :param resource_dicts: The Court and Fizaine constants per resource column, in the same order as sum_prod. Defaults to
+    coal, gas, and oil from constants.py.
+    :return: The exploitation ratio and EROI as two (years x resources) float64 arrays.
+    """
+    if resource_dicts is None:
+        resource_dicts = [c.Coal, c.Gas, c.Oil]
+    sum_prod = np.asarray(sum_prod, dtype=np.float64)
+
+    # The exploitation ratio is the summed production up to the previous year over the total production over all time, so the summed production is shifted down by a year (the first year has no prior production).
+    prior_sum_prod = np.zeros_like(sum_prod)
+    prior_sum_prod[1:] = sum_prod[:-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        expl_ratio = prior_sum_prod / sum_prod[-1:]
 
-    return output_df
+    return expl_ratio, fossil_EROI_eq(expl_ratio, resource_dicts)
 
+
+def fossil_EROI_eq(expl_ratio, resource_dicts):
+    """
+    EROI equation which uses the Court and Fizaine EROI eq (Sec 4.1.1) with the resource exploitation eq adjusted for time
+    and predicted total production (Sec 4.3).
+    :param expl_ratio: An array of exploitation ratios whose last axis lines up with resource_dicts.
+    :param resource_dicts: The Court and Fizaine constants per resource. The constants may also be arrays (i.e. one value
+    per parameter draw), which are stacked along a new last axis and broadcast against expl_ratio.
+    :return: A float64 array of EROI values in the broadcast shape of expl_ratio and the constants.
+    """
+    expl_ratio = np.asarray(expl_ratio, dtype=np.float64)
+    sf, initial, tl, me, rd = (np.stack([np.asarray(resource_dict[key], dtype=np.float64)
+                                         for resource_dict in resource_dicts], axis=-1)
+                               for key in EROI_CONSTANTS)
+    return (initial + (1 - initial) / (1 + np.exp(-tl * (expl_ratio - me)))) * np.exp(-rd * expl_ratio) * sf
+
+
+@instrumented("exploitation_ratio_adjusted")
 def exploitation_ratio_adjusted(prod_df):
     """An estimate of the exploitation ratio of a fossil fuel calculated through and based on Court and Fizaine's historical data. This follows a logistical growth/sigmoid function, and is used in the theoretical predictions of EROI (see 4.14 in the thesis).
     :param prod_df: A pandas dataframe of SUMMED YEARS result (gersdemo_summed_results).
     :return: The ratio of exploited resources per year (essentially, sum what has been produced over total predicted production over all time)."""
-    output_df = pd.DataFrame(columns=["Year", "Coal p", "Gas p", "Oil p"])
-
-    def _exploitation_ratio_eq(year, resource_type):
-        """Calculation of the adjusted exploitation ratio, located at 4.14 in the thesis."""
-        try:
-            cur_year_sum_prod = float(prod_df.loc[base_d_sum_prod["Year"]==year-1][resource_type + " Sum Prod"])
-        except Exception as e:
-            # Done since the first loc command would not exist and the result should be 0.
-            cur_year_sum_prod = 0
-        total_sum = prod_df[resource_type + " Sum Prod"].iloc[-1]
-        return cur_year_sum_prod/total_sum
-
-    # Creating the dataframe by calculating the exploitation ratio eq for each year.
-    for i in range(len(prod_df.index)):
-        cur_year = prod_df["Year"][i]
-        year_exploitation_ratio = pd.DataFrame.from_dict({
-            "Year": [cur_year],
-            "Coal p": [_exploitation_ratio_eq(cur_year, "Coal")],
-            "Gas p": [_exploitation_ratio_eq(cur_year, "Gas")],
-            "Oil p": [_exploitation_ratio_eq(cur_year, "Oil")]
-        })
-        output_df = pd.concat([output_df, year_exploitation_ratio], ignore_index=True)
-    return output_df
-
+    sum_prod = prod_df[["Coal Sum Prod", "Gas Sum Prod", "Oil Sum Prod"]].to_numpy(dtype=np.float64)
+    expl_ratio, _ = fossil_EROI_kernel(sum_prod)
+    return pd.DataFrame({
+        "Year": prod_df["Year"].to_numpy(),
+        "Coal p": expl_ratio[:, 0],
+        "Gas p": expl_ratio[:, 1],
+        "Oil p": expl_ratio[:, 2]
+    })
+
+@instrumented("resource_fossil_EROI")
 def resource_fossil_EROI(expl_ratio_df):
     """
     The calculation of the EROI value per coal, gas, and oil. Sec 4.1.1 and 4.3 shine more light on the basis for the EROI equation, but in summary: it combines the physical depletion and technological improvements of the related resource with respect to the amount of that resource already exploited.
     :param expl_ratio_df: The exploitation ratio dataframe calculated from exploitation_ratio_adjusted.
     :return: A dataframe of the EROI on a per year basis.
     """
-    output_df = pd.DataFrame(columns=["Year", "Coal EROI", "Gas EROI", "Oil EROI"])
-    coal_resource_dict = getattr(c, "Coal")
-    oil_resource_dict = getattr(c, "Oil")
-    gas_resource_dict = getattr(c, "Gas")
-
-    def _resource_fossil_EROI_eq(resource_er_value, resource_dict):
-        """
-        EROI equation which uses the Court and Fizaine EROI eq (Sec 4.1.1) with the resource exploitation eq adjusted for time and predicted total production (Sec 4.3).
-        """
-        return ((resource_dict["in"] +
-                 ((1 - resource_dict["in"]) / (
-                          1 + np.exp(
-                      -resource_dict["tl"] * (resource_er_value - resource_dict["me"]))))) *
-                 np.exp(-resource_dict["rd"] * resource_er_value) *
-                resource_dict["sf"])
-
-    for i in range(len(expl_ratio_df.index)):
-        cur_year = expl_ratio_df["Year"][i]
-        year_exploitation_ratio = pd.DataFrame.from_dict({
-            "Year": [cur_year],
-            "Coal EROI": [_resource_fossil_EROI_eq(expl_ratio_df["Coal p"][i], coal_resource_dict)],
-            "Gas EROI": [_resource_fossil_EROI_eq(expl_ratio_df["Gas p"][i], gas_resource_dict)],
-            "Oil EROI": [_resource_fossil_EROI_eq(expl_ratio_df["Oil p"][i], oil_resource_dict)]
-        })
-        output_df = pd.concat([output_df, year_exploitation_ratio], ignore_index=True)
-    return output_df
-
-
+    EROI = fossil_EROI_eq(expl_ratio_df[["Coal p", "Gas p", "Oil p"]].to_numpy(dtype=np.float64),
+                          [c.Coal, c.Gas, c.Oil])
+    return pd.DataFrame({
+        "Year": expl_ratio_df["Year"].to_numpy(),
+        "Coal EROI": EROI[:, 0],
+        "Gas EROI": EROI[:, 1],
+        "Oil EROI": EROI[:, 2]
+    })
+
+
+def _net_energy_multiplier(EROI_results, years, resource_names):
+    """The EROI table aligned to the year columns once, giving a (years x resources) array of the net energy multiplier 1 - 1/EROI."""
+    year_values = [int(float(year)) for year in years]
+    EROI_values = (EROI_results.assign(Year=EROI_results['Year'].astype(int)).set_index('Year')
+                   .reindex(year_values)[[resource + ' EROI' for resource in resource_names]]
+                   .to_numpy(dtype=np.float64))
+    return 1 - 1 / EROI_values
+
+
+@instrumented("net_energy_results")
 def net_energy_results(results_df, EROI_results, clean=True):
     """
     A calculation of the net energy produced for coal, gas, and oil on a PER YEAR basis. Functionally this is a modification of the PER YEAR total energy production with the predicted EROI per year on the original dataset.
 
     Still needs to be run under prod or sum results calc for per resource results.
-    :param results_df: A pandas dataframe of the outputted results.
+    :param results_df: A pandas dataframe of the outputted results, or a CompactResults.
     :param EROI_results: The EROI results dataframe which includes the per year EROI for coal, gas, and oil.
-    :param clean: Indicates whether the results_df should be cleaned with gersdemo_prepare_results. Do this if you just got an output from the model.
-    :return: A cleaned dataframe similar to gersdemo_prepare_results which is adjusted by EROI.
+    :param clean: Indicates whether the results_df should be cleaned with gersdemo_prepare_results. Do this if you just got an output from the model. Ignored for a CompactResults, which is always clean.
+    :return: A cleaned dataframe similar to gersdemo_prepare_results which is adjusted by EROI, or a CompactResults of the same dtype if one was given.
     """
 
-    # Need less values from the setup eq for net energy.
-    first_col_index, years, _, _, _, _ = gersdemo_pre_prod_calc(results_df=results_df, clean=clean)
+    if clean and not isinstance(results_df, CompactResults):
+        results_df = gersdemo_prepare_results(results_df)
+    metadata, years, year_block = gersdemo_year_block(results_df)
+
+    # Only coal, gas, and oil rows carry production that the EROI applies to. The original row order is kept.
+    resource_names = ["Coal", "Gas", "Oil"]
+    resource_rows = metadata['mineral'].isin(resource_names).to_numpy()
+    if not resource_rows.all():
+        metadata = metadata[resource_rows].reset_index(drop=True)
+        year_block = year_block[resource_rows]
+
+    net_energy_multiplier = _net_energy_multiplier(EROI_results, years, resource_names)
 
-    def _get_resource_dataframe(resource):
-        """Runs the net energy calculation for coal, gas, and oil individually. Locates the EROI value then applies it to the columns production."""
-        resource_data = results_df[results_df['mineral'] == resource]
-        for i, year in enumerate(years):
-            i_adj = i + first_col_index
-            resource_eroi_value = EROI_results.loc[EROI_results['Year'] == int(year), resource + ' EROI'].iloc[0]
-            resource_data.iloc[:, i_adj] = resource_data.iloc[:, i_adj] * (1 - 1 / resource_eroi_value)
-        return resource_data
+    # Each row picks the multiplier of its mineral, creating a (rows x years) matrix that is applied in a single broadcast multiply.
+    resource_index = pd.Categorical(metadata['mineral'], categories=resource_names).codes
+    net_year_block = np.multiply(year_block, net_energy_multiplier.T[resource_index], dtype=year_block.dtype)
 
-    net_energy_df = pd.concat(
-        [_get_resource_dataframe("Coal"), _get_resource_dataframe("Gas"), _get_resource_dataframe("Oil")],
-        ignore_index=True)
+    if isinstance(results_df, CompactResults):
+        return CompactResults(metadata, net_year_block, years)
+    net_energy_df = pd.concat([metadata.reset_index(drop=True), pd.DataFrame(net_year_block, columns=years)], axis=1)
 
     return net_energy_df
 
-def get_result_dataframes(loc, sheet_name):
+@instrumented("read_excel")
+def _read_excel(loc, sheet_name):
+    """Reads a results sheet from GeRS-DeMo as it is laid out in the spreadsheet."""
+    return pd.read_excel(loc, sheet_name, header=None)
+
+
+@instrumented("merge_general_output")
+def _merge_general_output(*frames):
+    """Merges the yearly production, net production, and EROI frames on the year."""
+    return functools.reduce(lambda left, right: pd.merge(left, right, on='Year'), frames)
+
+
+@instrumented("read_gersdemo_results")
+def read_gersdemo_results(loc, sheet_name, use_cache=True, cache_dir=cache.DEFAULT_CACHE_DIR,
+                          max_bytes=cache.DEFAULT_MAX_BYTES, compact=None, content_hash=None):
+    """
+    Reads and cleans a results spreadsheet from GeRS-DeMo, going through the on-disk cache so that each workbook is only
+    parsed once.
+    :param loc: The location of the spreadsheet in the files.
+    :param sheet_name: The name of the sheet (i.e. Dynamic_BG for Dynamic_BG_results).
+    :param use_cache: Indicates whether the cache should be used. If False, the workbook is always parsed.
+    :param cache_dir: The directory holding the cache entries.
+    :param max_bytes: The maximum total size of the cache.
+    :param compact: The dtype (np.float64 or np.float32) of a compact result (see compact.py), or None for a dataframe. A float64 compact result read from the cache keeps the memory-mapped year block without copying it.
+    :param content_hash: The hash of the workbook contents (see cache.workbook_hash) if it is already known, so that the workbook is not hashed again.
+    :return: The cleaned dataframe (see gersdemo_prepare_results), or a CompactResults. Through the cache, the year columns are always float64 (see cache.normalize_frame), whether or not the entry already existed.
+    """
+    if not use_cache:
+        return _prepare_results(_read_excel(loc, sheet_name), compact)
+
+    if content_hash is None:
+        content_hash = cache.workbook_hash(loc)
+    key = cache.cache_key(content_hash, sheet_name, prepare="gersdemo_prepare_results", fillna=0)
+    cleaned_output = cache.load_frame(key, cache_dir=cache_dir, compact=compact is not None)
+    if cleaned_output is None:
+        cleaned_output = gersdemo_prepare_results(_read_excel(loc, sheet_name))
+        first_col_index, _ = gersdemo_year_columns(cleaned_output)
+        cache.store_frame(key, cleaned_output, first_col_index, cache_dir=cache_dir, max_bytes=max_bytes,
+                          loc=os.path.abspath(loc), sheet=sheet_name, hash=content_hash)
+        # The first run returns the frame as later runs read it from the cache.
+        cleaned_output = cache.normalize_frame(cleaned_output, first_col_index)
+    return cleaned_output if compact is None else compact_results(cleaned_output, dtype=compact)
+
+
+@instrumented("gersdemo_direct_results")
+def gersdemo_direct_results(cleaned_output):
+    """
+    Rebuilds the spreadsheet layout of a GeRS-DeMo output (the attributes and years as the first column) from a cleaned
+    dataframe. Missing production shows as 0 rather than NA, since that is lost in cleaning.
+    :param cleaned_output: A cleaned pandas dataframe of the outputted results (see gersdemo_prepare_results), or a CompactResults.
+    :return: A dataframe in the layout of the original output.
+    """
+    if isinstance(cleaned_output, CompactResults):
+        cleaned_output = cleaned_output.to_frame()
+    return pd.DataFrame(np.vstack([cleaned_output.columns.to_numpy(dtype=object),
+                                   cleaned_output.to_numpy(dtype=object)]).T)
+
+
+def gersdemo_result_dataframes(cleaned_output):
+    """
+    All calculation results of get_result_dataframes that are computed from the cleaned spreadsheet.
+    :param cleaned_output: A cleaned pandas dataframe of the outputted results (see gersdemo_prepare_results).
+    :return: yearly_prod, sum_years_prod, net_yearly_prod, net_sum_years_prod, exploitation_ratio, EROI, general_output (see get_result_dataframes).
+    """
+    sum_years_prod = gersdemo_summed_results(cleaned_output, clean=False)
+    yearly_prod = gersdemo_prod_results(cleaned_output, clean=False)
+    exploitation_ratio = exploitation_ratio_adjusted(sum_years_prod)
+    EROI = resource_fossil_EROI(exploitation_ratio)
+
+    net_yearly_prod = net_energy_results(cleaned_output, EROI, clean=False)
+    net_sum_years_prod = gersdemo_prod_results(net_yearly_prod, clean=False)
+
+    general_output = _merge_general_output(yearly_prod, net_sum_years_prod, EROI)
+
+    return yearly_prod, sum_years_prod, net_yearly_prod, net_sum_years_prod, exploitation_ratio, EROI, general_output
+
+
+def _prepare_results(direct_output, compact=None):
+    """Cleans a GeRS-DeMo output into a dataframe, or into a CompactResults of the given dtype."""
+    cleaned_output = gersdemo_prepare_results(direct_output)
+    return cleaned_output if compact is None else compact_results(cleaned_output, dtype=compact)
+
+
+def _fingerprint(*inputs):
+    """A hash of the inputs of a calculation. Dataframe columns are hashed by their data, anything else by its JSON form."""
+    digest = hashlib.sha256()
+    for value in inputs:
+        if isinstance(value, (pd.Series, np.ndarray)):
+            digest.update(np.ascontiguousarray(np.asarray(value, dtype=np.float64)).tobytes())
+        else:
+            digest.update(json.dumps(value, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+class ResultDataframes:
+    """
+    The calculation results of a GeRS-DeMo results spreadsheet (see get_result_dataframes). Each result is calculated on
+    first access, along with only the results it depends on, and kept afterwards. Unpacking the object gives all nine
+    results in the order of get_result_dataframes, so it can be used in place of the tuple.
+    """
+    OUTPUTS = ("direct_output", "cleaned_output", "yearly_prod", "sum_years_prod", "net_yearly_prod",
+               "net_sum_years_prod", "exploitation_ratio", "EROI", "general_output")
+
+    def __init__(self, loc, sheet_name, use_cache=False, cache_dir=cache.DEFAULT_CACHE_DIR, drop_intermediates=False,
+                 compact=None, track_changes=False, content_hash=None):
+        """
+        :param loc: The location of the spreadsheet in the files.
+        :param sheet_name: The name of the sheet (i.e. Dynamic_BG for Dynamic_BG_results).
+        :param use_cache: Indicates whether the cleaned spreadsheet should be read through the on-disk cache (see read_gersdemo_results).
+        :param cache_dir: The directory holding the cache entries.
+        :param drop_intermediates: Indicates whether results that were only calculated as a step towards an accessed result should be dropped afterwards, to save memory. They are calculated again if they are needed later.
+        :param compact: The dtype (np.float64 or np.float32) of a compact cleaned dataset (see compact.py), or None for dataframes. When set, cleaned_output and net_yearly_prod are CompactResults.
+        :param track_changes: Indicates whether the inputs of each result should be fingerprinted when it is calculated, so that refresh only recalculates the stages and resources whose inputs changed. This hashes the year blocks on every calculation, so it is off unless refresh is going to be used.
+        :param content_hash: The hash of the workbook contents if it is already known (i.e. from a worker process, see scenarios.py), so that reading through the cache does not hash the workbook again. It is forgotten on refresh.
+        """
+        self.loc = loc
+        self.sheet_name = sheet_name
+        self.use_cache = use_cache
+        self.cache_dir = cache_dir
+        self.drop_intermediates = drop_intermediates
+        self.compact = compact
+        self.track_changes = track_changes
+        self._results = {}
+        self._accessed = set()
+        # The input fingerprints of each kept result when it was calculated (see refresh).
+        self._fingerprints = {}
+        self._workbook_hash = content_hash
+
+        # The dependency graph: each result with the function calculating it and the results that function takes.
+        # The order lists the results so that each comes after the results it depends on.
+        if use_cache:
+            reading = {
+                "cleaned_output": (lambda: read_gersdemo_results(loc, sheet_name, cache_dir=cache_dir, compact=compact,
+                                                                 content_hash=self._workbook_hash), ()),
+                "direct_output": (gersdemo_direct_results, ("cleaned_output",))
+            }
+            self.order = ("cleaned_output", "direct_output")
+        else:
+            reading = {
+                "direct_output": (lambda: _read_excel(loc, sheet_name), ()),
+                "cleaned_output": (lambda df: _prepare_results(df, compact), ("direct_output",))
+            }
+            self.order = ("direct_output", "cleaned_output")
+        self.dependencies = dict(reading, **{
+            "yearly_prod": (lambda df: gersdemo_prod_results(df, clean=False), ("cleaned_output",)),
+            "sum_years_prod": (lambda df: gersdemo_summed_results(df, clean=False), ("cleaned_output",)),
+            "exploitation_ratio": (exploitation_ratio_adjusted, ("sum_years_prod",)),
+            "EROI": (resource_fossil_EROI, ("exploitation_ratio",)),
+            "net_yearly_prod": (lambda df, EROI: net_energy_results(df, EROI, clean=False),
+                                ("cleaned_output", "EROI")),
+            "net_sum_years_prod": (lambda df: gersdemo_prod_results(df, clean=False), ("net_yearly_prod",)),
+            "general_output": (_merge_general_output, ("yearly_prod", "net_sum_years_prod", "EROI"))
+        })
+        self.order += ("yearly_prod", "sum_years_prod", "exploitation_ratio", "EROI", "net_yearly_prod",
+                       "net_sum_years_prod", "general_output")
+
+    def keep(self, **results):
+        """
+        Keeps results that were already calculated elsewhere (i.e. by a worker process, see scenarios.py), so they are
+        not calculated again.
+        :param results: The results by name (see OUTPUTS).
+        """
+        for name, result in results.items():
+            if name not in self.OUTPUTS:
+                raise ValueError(f"Invalid result: {name}. Must be one of {self.OUTPUTS}.")
+            self._results[name] = result
+            self._accessed.add(name)
+            if self.track_changes:
+                self._fingerprints[name] = self._input_fingerprints(name)
+
+    def _calculate(self, name):
+        """Calculates a result and the results it depends on, reusing those already kept."""
+        if name not in self._results:
+            function, dependency_names = self.dependencies[name]
+            self._results[name] = function(*[self._calculate(dependency) for dependency in dependency_names])
+            if self.track_changes:
+                self._fingerprints[name] = self._input_fingerprints(name)
+        return self._results[name]
+
+    def _input_fingerprints(self, name):
+        """
+        The fingerprints of the inputs of a result: the workbook contents, the data of the results it depends on, and the
+        constants it reads. Results calculated per resource have a fingerprint per resource, the others one under "all".
+        """
+        # The reading stages and the results summed straight from them depend only on the workbook. Their fingerprint is
+        # taken from the workbook itself, since the kept reading results (and their fingerprints) may have been dropped.
+        if name in ("direct_output", "cleaned_output", "yearly_prod", "sum_years_prod"):
+            if self._workbook_hash is None:
+                self._workbook_hash = cache.workbook_hash(self.loc)
+            return {"all": _fingerprint(self._workbook_hash, self.sheet_name)}
+        # Per resource results also fingerprint their year axis (and the net PER YEAR production its rows) under "all",
+        # since a resource's columns can only be recalculated in place while the shape of the result stays the same.
+        if name == "exploitation_ratio":
+            sum_years_prod = self._calculate("sum_years_prod")
+            return dict({resource: _fingerprint(sum_years_prod[resource + " Sum Prod"]) for resource in c.valid_resources},
+                        all=_fingerprint(sum_years_prod["Year"].tolist()))
+        if name == "EROI":
+            exploitation_ratio = self._calculate("exploitation_ratio")
+            # Only the constants of the EROI equation, so that i.e. a changed URR or tlag does not recalculate the EROI.
+            return dict({resource: _fingerprint(exploitation_ratio[resource + " p"],
+                                                {key: getattr(c, resource)[key] for key in EROI_CONSTANTS})
+                         for resource in c.valid_resources}, all=_fingerprint(exploitation_ratio["Year"].tolist()))
+        if name == "net_yearly_prod":
+            metadata, years, year_block = gersdemo_year_block(self._calculate("cleaned_output"))
+            EROI = self._calculate("EROI")
+            resource_rows = metadata['mineral'].isin(c.valid_resources).to_numpy()
+            return dict({resource: _fingerprint(year_block[(metadata['mineral'] == resource).to_numpy()].ravel(),
+                                                list(years), EROI[resource + " EROI"])
+                         for resource in c.valid_resources},
+                        all=_fingerprint(list(years), metadata[resource_rows].astype(str).values.tolist()))
+        if name == "net_sum_years_prod":
+            return self._input_fingerprints("net_yearly_prod")
+        return {"all": _fingerprint(*[self._input_fingerprints(dependency)
+                                      for dependency in self.dependencies[name][1]])}
+
+    def _update_resource(self, name, resource):
+        """Recalculates the columns (or rows, for the net PER YEAR production) of a single resource in a kept result."""
+        result = self._results[name]
+        if name == "exploitation_ratio":
+            result = result.copy()
+            sum_prod = self._calculate("sum_years_prod")[[resource + " Sum Prod"]].to_numpy(dtype=np.float64)
+            result[resource + " p"] = fossil_EROI_kernel(sum_prod, [getattr(c, resource)])[0][:, 0]
+        elif name == "EROI":
+            result = result.copy()
+            expl_ratio = self._calculate("exploitation_ratio")[[resource + " p"]].to_numpy(dtype=np.float64)
+            result[resource + " EROI"] = fossil_EROI_eq(expl_ratio, [getattr(c, resource)])[:, 0]
+        elif name == "net_yearly_prod":
+            metadata, years, year_block = gersdemo_year_block(self._calculate("cleaned_output"))
+            year_block = year_block[metadata['mineral'].isin(c.valid_resources).to_numpy()]
+            net_metadata, _, net_year_block = gersdemo_year_block(result)
+            resource_rows = (net_metadata['mineral'] == resource).to_numpy()
+            multiplier = _net_energy_multiplier(self._calculate("EROI"), years, [resource])[:, 0]
+            net_year_block = net_year_block.copy()
+            net_year_block[resource_rows] = year_block[resource_rows] * multiplier
+            if isinstance(result, CompactResults):
+                result = CompactResults(net_metadata, net_year_block, years)
+            else:
+                result = pd.concat([net_metadata, pd.DataFrame(net_year_block, columns=years)], axis=1)
+        elif name == "net_sum_years_prod":
+            result = result.copy()
+            net_metadata, _, net_year_block = gersdemo_year_block(self._calculate("net_yearly_prod"))
+            resource_rows = (net_metadata['mineral'] == resource).to_numpy()
+            # NA values are skipped as in gersdemo_aggregate_results (i.e. a resource without production has an NA EROI).
+            result[resource + " Prod"] = np.nansum(net_year_block[resource_rows], axis=0, dtype=np.float64)
+        self._results[name] = result
+
+    @instrumented("refresh")
+    def refresh(self):
+        """
+        Brings the kept results up to date after the workbook or the constants in constants.py changed, recalculating
+        only the results whose inputs changed. Results calculated per resource (the exploitation ratio, EROI, and net
+        production) only have the columns of the changed resources recalculated, i.e. a change to Gas["rd"] only
+        recalculates the gas EROI and net production.
+        Without track_changes there is nothing to compare against, so every kept result is recalculated.
+        :return: A list of (result, resource) pairs that were recalculated, where resource is "all" for whole results.
+        """
+        self._workbook_hash = None
+        if not self.track_changes:
+            kept = [name for name in self.order if name in self._results]
+            self._results.clear()
+            for name in kept:
+                self._calculate(name)
+            self._drop_intermediates()
+            return [(name, "all") for name in kept]
+
+        recalculated = []
+        for name in self.order:
+            if name not in self._results:
+                continue
+            current = self._input_fingerprints(name)
+            stale = [resource for resource, fingerprint in current.items()
+                     if self._fingerprints.get(name, {}).get(resource) != fingerprint]
+            if not stale:
+                continue
+            if "all" in stale:
+                del self._results[name]
+                self._calculate(name)
+                stale = ["all"]
+            else:
+                for resource in stale:
+                    self._update_resource(name, resource)
+                self._fingerprints[name] = current
+            recalculated += [(name, resource) for resource in stale]
+        self._drop_intermediates()
+        return recalculated
+
+    def get(self, name):
+        """
+        A result by name (see OUTPUTS), calculated if it is not kept yet.
+        :param name: The name of the result.
+        :return: The result dataframe.
+        """
+        if name not in self.OUTPUTS:
+            raise AttributeError(f"Invalid result: {name}. Must be one of {self.OUTPUTS}.")
+        self._accessed.add(name)
+        result = self._calculate(name)
+        self._drop_intermediates()
+        return result
+
+    def _drop_intermediates(self):
+        """Drops the kept results that were never accessed directly, if drop_intermediates is set."""
+        if self.drop_intermediates:
+            for kept_name in list(self._results):
+                if kept_name not in self._accessed:
+                    del self._results[kept_name]
+                    self._fingerprints.pop(kept_name, None)
+
+    def __getattr__(self, name):
+        if name.startswith("_") or name not in self.OUTPUTS:
+            raise AttributeError(name)
+        return self.get(name)
+
+    def __iter__(self):
+        return (self.get(name) for name in self.OUTPUTS)
+
+    def __len__(self):
+        return len(self.OUTPUTS)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return tuple(self.get(name) for name in self.OUTPUTS[index])
+        return self.get(self.OUTPUTS[index])
+
+
+def get_result_dataframes(loc, sheet_name, use_cache=False, cache_dir=cache.DEFAULT_CACHE_DIR, drop_intermediates=False,
+                          compact=None, track_changes=False):
     """
     Given the location of a results spreadsheet from GeRS-DeMo and the relevant sheet, return all calculation results to be used in future visualizations.
     :param loc: The location of the spreadsheet in the files.
     :param sheet_name: The name of the sheet (i.e. Dynamic_BG for Dynamic_BG_results).
-    :return: direct_output - the original output from basic pandas operations;
+    :param use_cache: Indicates whether the cleaned spreadsheet should be read through the on-disk cache (see read_gersdemo_results). When it is, direct_output is rebuilt from the cleaned spreadsheet, so missing production shows as 0 rather than NA.
+    :param cache_dir: The directory holding the cache entries.
+    :param drop_intermediates: Indicates whether results that were only calculated as a step towards an accessed result should be dropped afterwards (see ResultDataframes).
+    :param compact: The dtype (np.float64 or np.float32) of a compact cleaned dataset, or None for dataframes (see ResultDataframes).
+    :param track_changes: Indicates whether refresh should only recalculate the stages and resources whose inputs changed (see ResultDataframes).
+    :return: A ResultDataframes object, which calculates each result on first access and unpacks into:
+    direct_output - the original output from basic pandas operations;
     cleaned_output - a cleaned spreadsheet for use programatically;
     yearly_prod - the PER YEAR production for coal, gas, and oil;
     sum_years_prod -  the SUMMED YEARS production for coal, gas, and oil;
@@ -228,17 +623,5 @@ def get_result_dataframes(loc, sheet_name):
     EROI - the EROI calculated PER YEAR for coal, gas, and oil;
     general_output - a combination of yearly production, net sum years production, and EROI.
     """
-    direct_output = pd.read_excel(loc, sheet_name, header=None)
-    sum_years_prod = gersdemo_summed_results(direct_output)
-    yearly_prod = gersdemo_prod_results(direct_output)
-    exploitation_ratio = exploitation_ratio_adjusted(sum_years_prod)
-    EROI = resource_fossil_EROI(exploitation_ratio)
-
-    cleaned_output = gersdemo_prepare_results(direct_output)
-    net_yearly_prod = net_energy_results(cleaned_output, EROI, clean=False)
-    net_sum_years_prod = gersdemo_prod_results(net_yearly_prod, clean=False)
-
-    general_output = functools.reduce(lambda left, right: pd.merge(left, right, on='Year'),
-                                      [yearly_prod, net_sum_years_prod, EROI])
-
-    return direct_output, cleaned_output, yearly_prod, sum_years_prod, net_yearly_prod, net_sum_years_prod, exploitation_ratio, EROI, general_output
+    return ResultDataframes(loc, sheet_name, use_cache=use_cache, cache_dir=cache_dir,
+                            drop_intermediates=drop_intermediates, compact=compact, track_changes=track_changes)
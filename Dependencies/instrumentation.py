@@ -0,0 +1,209 @@
+# Opt-in instrumentation of the EROI pipeline. Stages in functions.py are wrapped with the instrumented decorator, which
+# reports the time, row/column counts, and memory change of each call to any registered listeners. Without listeners the
+# decorator only checks an empty list before calling the stage, so the overhead is negligible when it is not in use.
+#
+# i.e.:
+#     with collect(memory=True) as report:
+#         list(get_result_dataframes("Datasets/Dynamic_BG_results.xlsx", "Dynamic_BG"))
+#     report.summary()
+#     report.to_json("run.json")
+#     report.to_folded("run.folded")  # For flamegraph.pl or speedscope.
+
+# For wrapping the stage functions.
+import functools
+# For the JSON export.
+import json
+# For the logging listener.
+import logging
+# For timing and memory.
+import time
+import tracemalloc
+# For the context manager that collects a run report.
+from contextlib import contextmanager
+# For the summary table.
+import pandas as pd
+
+_listeners = []
+# The stages currently running, outermost first.
+_stack = []
+_memory_tracking = [0]
+
+
+def add_listener(listener):
+    """
+    Registers a function called with the event dictionary of every finished stage (see instrumented).
+    :param listener: The function to register.
+    :return: The listener, so that it can be removed later.
+    """
+    _listeners.append(listener)
+    return listener
+
+
+def remove_listener(listener):
+    """Unregisters a listener added with add_listener."""
+    if listener in _listeners:
+        _listeners.remove(listener)
+
+
+def log_listener(logger=None, level=logging.INFO):
+    """
+    A listener that writes each finished stage to a logger.
+    :param logger: The logger. Defaults to the logger of this module.
+    :param level: The logging level of the messages.
+    :return: The listener, to be passed to add_listener.
+    """
+    logger = logger or logging.getLogger(__name__)
+
+    def _log(event):
+        logger.log(level, "%s%s: %.2fms, %s rows x %s columns out, %s bytes", "  " * event["depth"], event["stage"],
+                   event["duration"] * 1000, event["rows_out"], event["cols_out"], event["memory_delta"])
+    return _log
+
+
+def _shape(value):
+    """The row and column counts of a dataframe or array, otherwise None."""
+    shape = getattr(value, "shape", None)
+    if shape is None:
+        return None, None
+    return shape[0], shape[1] if len(shape) > 1 else 1
+
+
+def instrumented(stage):
+    """
+    Decorator reporting every call of a pipeline stage to the registered listeners. The event of a call holds the stage
+    name, its parent stages, start time and duration in seconds, the row/column counts of the first argument and the
+    result, and the change in traced memory in bytes (None unless memory tracking is on, see collect).
+    :param stage: The name of the stage.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _listeners:
+                return func(*args, **kwargs)
+
+            parents = tuple(_stack)
+            _stack.append(stage)
+            memory_before = tracemalloc.get_traced_memory()[0] if _memory_tracking[0] else None
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                duration = time.perf_counter() - start
+                _stack.pop()
+            memory_delta = tracemalloc.get_traced_memory()[0] - memory_before if memory_before is not None else None
+
+            rows_in, cols_in = _shape(args[0]) if args else (None, None)
+            rows_out, cols_out = _shape(result)
+            event = {
+                "stage": stage,
+                "parents": parents,
+                "depth": len(parents),
+                "start": start,
+                "duration": duration,
+                "rows_in": rows_in,
+                "cols_in": cols_in,
+                "rows_out": rows_out,
+                "cols_out": cols_out,
+                "memory_delta": memory_delta
+            }
+            for listener in list(_listeners):
+                listener(event)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+class RunReport:
+    """The events of the stages finished during a collect block, with exports for later analysis."""
+
+    def __init__(self):
+        self.events = []
+
+    def __call__(self, event):
+        self.events.append(event)
+
+    def summary(self):
+        """
+        The total time, number of calls, and memory change per stage.
+        :return: A pandas dataframe with one row per stage, slowest first. The memory change is NA for stages that ran
+        without memory tracking (see collect).
+        """
+        if not self.events:
+            return pd.DataFrame(columns=["stage", "calls", "total_duration", "self_duration", "memory_delta"])
+        events = pd.DataFrame(self._with_self_durations())
+        events["memory_delta"] = pd.to_numeric(events["memory_delta"])
+        stages = events.groupby("stage")
+        summary = stages.agg(calls=("duration", "size"), total_duration=("duration", "sum"),
+                             self_duration=("self_duration", "sum"))
+        # Without memory tracking every change is None, which a plain sum would report as 0.
+        summary["memory_delta"] = stages["memory_delta"].sum(min_count=1)
+        return summary.reset_index().sort_values("total_duration", ascending=False, ignore_index=True)
+
+    def _with_self_durations(self):
+        """The events with the time spent in the stage itself, excluding instrumented stages it called."""
+        # Events finish innermost first, so the children of a call are the deeper events just before it.
+        events = [dict(event) for event in self.events]
+        for i, event in enumerate(events):
+            child_duration = 0
+            for child in reversed(events[:i]):
+                if child["depth"] <= event["depth"]:
+                    break
+                if child["depth"] == event["depth"] + 1:
+                    child_duration += child["duration"]
+            event["self_duration"] = event["duration"] - child_duration
+        return events
+
+    def to_json(self, loc=None):
+        """
+        The events as JSON.
+        :param loc: An optional location to write the JSON to.
+        :return: The JSON string.
+        """
+        report = json.dumps({"events": self.events}, indent=1, default=list)
+        if loc is not None:
+            with open(loc, "w") as file:
+                file.write(report)
+        return report
+
+    def to_folded(self, loc=None):
+        """
+        The events in the folded stack format read by flamegraph.pl and speedscope, with self times in microseconds.
+        :param loc: An optional location to write the stacks to.
+        :return: The folded stacks as a string.
+        """
+        stacks = {}
+        for event in self._with_self_durations():
+            stack = ";".join(event["parents"] + (event["stage"],))
+            stacks[stack] = stacks.get(stack, 0) + max(int(event["self_duration"] * 1e6), 0)
+        folded = "\n".join(f"{stack} {duration}" for stack, duration in stacks.items())
+        if loc is not None:
+            with open(loc, "w") as file:
+                file.write(folded + "\n")
+        return folded
+
+
+@contextmanager
+def collect(memory=False):
+    """
+    Collects the events of every instrumented stage run inside the block into a RunReport.
+    :param memory: Indicates whether memory changes should be measured. This starts tracemalloc for the block, which
+    slows the stages down.
+    :return: The RunReport, filled in as the stages finish.
+    """
+    report = add_listener(RunReport())
+    started_tracing = memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    if memory:
+        _memory_tracking[0] += 1
+    try:
+        yield report
+    finally:
+        if memory:
+            _memory_tracking[0] -= 1
+        if started_tracing:
+            tracemalloc.stop()
+        remove_listener(report)
@@ -0,0 +1,132 @@
+# Functionality for breaking the gross production, net production, and net/gross energy ratio of coal, gas, and oil down
+# by continent, country, region, subregion, submineral, or superregion (Datasets/Country_to_Superregion.csv). Every group
+# is calculated in one grouped pass over the cleaned dataset rather than rerunning the production and net energy
+# calculations per group.
+
+# For the location of the superregion mapping.
+import os
+# For general data preparation/wrangling.
+import pandas as pd
+# For the year blocks.
+import numpy as np
+# General program functions
+from Dependencies import functions as f
+
+# Readable names for the GeRS-DeMo continents, as used in the thesis figures.
+CONTINENT_NAMES = {
+    'FSU': 'Former Soviet Union',
+    'North_America': 'North America',
+    'South_America': 'Latin America',
+    'Middle_East': 'Middle East'
+}
+DEFAULT_SUPERREGION_LOC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Datasets",
+                                       "Country_to_Superregion.csv")
+GROUP_COLUMNS = ["continent", "country", "region", "subregion", "submineral", "superregion"]
+RESOURCES = ["Coal", "Gas", "Oil"]
+
+
+def continent_name(continent):
+    """The readable name of a continent (i.e. "Former Soviet Union" for "FSU"). Names with spaces are matched as well."""
+    return CONTINENT_NAMES.get(str(continent).replace(" ", "_"), continent)
+
+
+def continent_code(continent):
+    """The GeRS-DeMo code of a continent (i.e. "FSU" for "Former Soviet Union", "Middle_East" for "Middle East")."""
+    continent = str(continent)
+    codes = {name: code for code, name in CONTINENT_NAMES.items()}
+    return codes.get(continent, continent.replace(" ", "_"))
+
+
+def rename_continents(results_df, column="continent"):
+    """
+    Renames the continents of a dataframe to their readable names (see CONTINENT_NAMES).
+    :param results_df: A pandas dataframe with a continent column.
+    :param column: The name of the continent column.
+    :return: A copy of results_df with the renamed continents.
+    """
+    results_df = results_df.copy()
+    results_df[column] = results_df[column].map(continent_name)
+    return results_df
+
+
+def country_superregions(results_df, superregion_loc=DEFAULT_SUPERREGION_LOC, rename=True):
+    """
+    The superregion of each row, given by the country to superregion mapping. Countries that are not in the mapping
+    (i.e. "USA" or "FSU") fall back to their continent.
+    :param results_df: A cleaned pandas dataframe of the outputted results.
+    :param superregion_loc: The location of the country to superregion csv.
+    :param rename: Indicates whether the superregions should use the readable continent names.
+    :return: A pandas series of superregions in the order of results_df.
+    """
+    # The mapping uses readable names, so they are turned into GeRS-DeMo codes to match the continents they fall back to.
+    mapping = pd.read_csv(superregion_loc).set_index("Country name")["Continent"].map(continent_code)
+    superregions = results_df["country"].astype(str).str.replace("_", " ").map(mapping)
+    superregions = superregions.fillna(results_df["continent"]).reset_index(drop=True)
+    if rename:
+        superregions = superregions.map(continent_name)
+    return superregions
+
+
+def regional_breakdown(results_df, EROI_results, group_by="continent", rename=True, tidy=True,
+                       superregion_loc=DEFAULT_SUPERREGION_LOC):
+    """
+    The PER YEAR gross production, net production, and net/gross energy ratio of coal, gas, oil, and their total, for
+    every group in the dataset.
+    :param results_df: A cleaned pandas dataframe of the outputted results (see gersdemo_prepare_results), or a
+    CompactResults.
+    :param EROI_results: The EROI results dataframe which includes the per year EROI for coal, gas, and oil.
+    :param group_by: The grouping, one of GROUP_COLUMNS.
+    :param rename: Indicates whether continents (and superregions) should use their readable names.
+    :param tidy: Indicates whether a long table should be returned. Otherwise, a Year-indexed frame with (group,
+    mineral, measure) columns is returned.
+    :param superregion_loc: The location of the country to superregion csv, used when grouping by superregion.
+    :return: A long pandas dataframe with the group, mineral ("Coal", "Gas", "Oil" or "Total"), Year, "Gross Prod",
+    "Net Prod" and "Energy Ratio" (net over gross, NA without gross production) columns.
+    """
+    if group_by not in GROUP_COLUMNS:
+        raise ValueError(f"Invalid grouping: {group_by}. Must be one of {GROUP_COLUMNS}.")
+
+    # The net energy keeps the original row order of the coal, gas, and oil rows, so the gross rows line up with it.
+    _, _, net_year_block = f.gersdemo_year_block(f.net_energy_results(results_df, EROI_results, clean=False))
+    metadata, years, gross_year_block = f.gersdemo_year_block(results_df)
+    resource_rows = metadata['mineral'].isin(RESOURCES).to_numpy()
+    metadata = metadata[resource_rows].reset_index(drop=True)
+    year_values = np.array([int(float(year)) for year in years])
+
+    if group_by == "superregion":
+        groups = country_superregions(metadata, superregion_loc=superregion_loc, rename=rename)
+    elif group_by == "continent" and rename:
+        groups = metadata["continent"].map(continent_name)
+    else:
+        groups = metadata[group_by]
+
+    # Gross and net production are placed side by side so that a single groupby sums both.
+    year_block = np.hstack([gross_year_block[resource_rows], net_year_block]).astype(np.float64, copy=False)
+    summed = pd.DataFrame(year_block, copy=False).groupby([np.asarray(groups, dtype=object),
+                                                           metadata['mineral'].to_numpy(dtype=object)]).sum()
+    group_names = summed.index.get_level_values(0).unique()
+    summed = summed.reindex(pd.MultiIndex.from_product([group_names, RESOURCES]), fill_value=0.0)
+
+    # The totals of each group are added as a fourth mineral.
+    sums = summed.to_numpy().reshape(len(group_names), len(RESOURCES), 2, len(years))
+    sums = np.concatenate([sums, sums.sum(axis=1, keepdims=True)], axis=1)
+    gross, net = sums[:, :, 0], sums[:, :, 1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        energy_ratio = np.where(gross != 0, net / gross, np.nan)
+
+    minerals = RESOURCES + ["Total"]
+    if not tidy:
+        columns = pd.MultiIndex.from_product([group_names, minerals, ["Gross Prod", "Net Prod", "Energy Ratio"]],
+                                             names=[group_by, "mineral", "measure"])
+        values = np.stack([gross, net, energy_ratio], axis=2).reshape(-1, len(years)).T
+        return pd.DataFrame(values, index=pd.Index(year_values, name="Year"), columns=columns)
+
+    n_groups, n_minerals, n_years = len(group_names), len(minerals), len(years)
+    return pd.DataFrame({
+        group_by: np.repeat(np.asarray(group_names, dtype=object), n_minerals * n_years),
+        "mineral": np.tile(np.repeat(minerals, n_years), n_groups),
+        "Year": np.tile(year_values, n_groups * n_minerals),
+        "Gross Prod": gross.ravel(),
+        "Net Prod": net.ravel(),
+        "Energy Ratio": energy_ratio.ravel()
+    })
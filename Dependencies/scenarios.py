@@ -0,0 +1,109 @@
+# Runs get_result_dataframes for a batch of GeRS-DeMo scenarios across a process pool. Each worker parses and calculates
+# one scenario and leaves the large per-mine cleaned frame in the on-disk cache (see cache.py) instead of pickling it
+# between processes. Only the workbook hash and the small per-year frames are sent back, and each scenario is returned
+# as a ResultDataframes that reads the cleaned frame (and rebuilds the frames made from it) only when it is accessed, so
+# the parent process does almost no work per scenario.
+
+# For running scenarios in parallel.
+from concurrent.futures import ProcessPoolExecutor, as_completed
+# For the default number of workers.
+import os
+# For timing the results.
+import time
+# For reporting scenario failures without stopping the batch.
+import traceback
+# General program functions
+from Dependencies import functions as f
+from Dependencies import cache
+
+
+def _scenario_spec(spec):
+    """Accepts (loc, sheet_name) or (name, loc, sheet_name) scenario specs, naming scenarios after their sheet by default."""
+    if len(spec) == 2:
+        loc, sheet_name = spec
+        return sheet_name, loc, sheet_name
+    return tuple(spec)
+
+
+def _run_scenario(loc, sheet_name, cache_dir, max_bytes):
+    """
+    The work done for one scenario in a worker process.
+    :return: The elapsed time, the hash of the workbook contents, and the per-year results. The cleaned frame is left in
+    the cache.
+    """
+    start = time.time()
+    content_hash = cache.workbook_hash(loc)
+    cleaned_output = f.read_gersdemo_results(loc, sheet_name, cache_dir=cache_dir, max_bytes=max_bytes,
+                                             content_hash=content_hash)
+    yearly_prod, sum_years_prod, _, net_sum_years_prod, exploitation_ratio, EROI, general_output = \
+        f.gersdemo_result_dataframes(cleaned_output)
+    return time.time() - start, content_hash, {
+        "yearly_prod": yearly_prod,
+        "sum_years_prod": sum_years_prod,
+        "net_sum_years_prod": net_sum_years_prod,
+        "exploitation_ratio": exploitation_ratio,
+        "EROI": EROI,
+        "general_output": general_output
+    }
+
+
+def _collect_scenario(loc, sheet_name, content_hash, frames, cache_dir):
+    """
+    The results of a scenario from a worker's output. The cleaned frame is read from the cache, and direct_output and
+    net_yearly_prod are rebuilt from it, only when they are accessed.
+    """
+    results = f.ResultDataframes(loc, sheet_name, use_cache=True, cache_dir=cache_dir, content_hash=content_hash)
+    results.keep(**frames)
+    return results
+
+
+def run_scenarios(scenarios, max_workers=None, cache_dir=cache.DEFAULT_CACHE_DIR, max_bytes=cache.DEFAULT_MAX_BYTES,
+                  verbose=False):
+    """
+    Given a list of GeRS-DeMo result spreadsheets, calculate the results of each (see get_result_dataframes) in parallel.
+    :param scenarios: A list of (loc, sheet_name) or (name, loc, sheet_name) specs. Without a name, a scenario is named
+    after its sheet (i.e. ("Datasets/Dynamic_BG_results.xlsx", "Dynamic_BG") is named Dynamic_BG).
+    :param max_workers: The number of worker processes. Defaults to the number of CPUs, capped at the number of
+    scenarios. With 1, the scenarios run one after another in this process.
+    :param cache_dir: The directory holding the cache entries that are used to pass results between processes.
+    :param max_bytes: The maximum total size of the cache.
+    :param verbose: Indicates whether the completion time of each scenario should be printed.
+    :return: results - the results per scenario name, as a ResultDataframes which unpacks into the nine
+    get_result_dataframes outputs (the per-year results are already calculated, and the cleaned frame is read from the
+    cache on access);
+    failures - the traceback of each scenario name which failed;
+    timings - the time for completion in seconds per successful scenario name.
+    """
+    specs = [_scenario_spec(spec) for spec in scenarios]
+    names = [name for name, _, _ in specs]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Scenario names must be unique, got {names}.")
+    if max_workers is None:
+        max_workers = min(os.cpu_count() or 1, len(specs))
+
+    results, failures, timings = {}, {}, {}
+
+    def _record(name, loc, sheet_name, run):
+        try:
+            elapsed, content_hash, frames = run()
+            results[name] = _collect_scenario(loc, sheet_name, content_hash, frames, cache_dir)
+            timings[name] = elapsed
+            if verbose:
+                print(f"{name} EROI results finished. Time for completion was {elapsed:.2f}sec.")
+        except Exception:
+            failures[name] = traceback.format_exc()
+            if verbose:
+                print(f"{name} EROI results failed.")
+
+    if max_workers <= 1:
+        for name, loc, sheet_name in specs:
+            _record(name, loc, sheet_name, lambda: _run_scenario(loc, sheet_name, cache_dir, max_bytes))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(_run_scenario, loc, sheet_name, cache_dir, max_bytes): (name, loc, sheet_name)
+                       for name, loc, sheet_name in specs}
+            for future in as_completed(futures):
+                name, loc, sheet_name = futures[future]
+                _record(name, loc, sheet_name, future.result)
+
+    return results, failures, timings
@@ -0,0 +1,144 @@
+# Monte Carlo sensitivity analysis of the Court and Fizaine EROI constants. The constants in constants.py are point
+# estimates; here they are drawn from user-specified distributions and the EROI and net energy of every draw, year, and
+# resource are calculated as one batched array computation. The percentiles are taken per year, so the years are
+# evaluated in chunks that are each reduced to their percentiles straight away, bounding memory by the number of draws
+# times the chunk of years. The results are percentile bands per year, which can be plotted like the Base/High/Low
+# uncertainty range.
+
+# For evaluating chunks of draws in parallel.
+from concurrent.futures import ProcessPoolExecutor
+# For general data preparation/wrangling.
+import pandas as pd
+# For the batched calculations.
+import numpy as np
+# Court & Fizaine's constants for the exploitation ratio
+from Dependencies import constants as c
+# General program functions
+from Dependencies import functions as f
+
+RESOURCES = ["Coal", "Gas", "Oil"]
+PARAMETERS = ["sf", "in", "tl", "me", "rd", "URR"]
+
+
+def draw_parameters(distributions, n_draws, seed=None):
+    """
+    Draws sets of Court and Fizaine constants.
+    :param distributions: The distribution of each varied constant per resource, i.e. {"Gas": {"rd": ("normal", 4.98, 0.3)}}.
+    A distribution is either the name of a numpy random Generator method followed by its arguments (i.e. ("uniform",
+    low, high) or ("triangular", left, mode, right)), or a function taking the Generator and the number of draws.
+    Constants which are not given keep their point estimate from constants.py.
+    :param n_draws: The number of parameter sets.
+    :param seed: The seed of the random generator, for reproducible draws.
+    :return: A dictionary per resource of float64 arrays with one value per draw for every constant.
+    """
+    for resource in distributions:
+        if resource not in RESOURCES:
+            raise ValueError(f"Invalid resource: {resource}. Must be one of {RESOURCES}.")
+
+    rng = np.random.default_rng(seed)
+    parameters = {}
+    for resource in RESOURCES:
+        resource_dict = getattr(c, resource)
+        resource_distributions = distributions.get(resource, {})
+        for key in resource_distributions:
+            if key not in PARAMETERS:
+                raise ValueError(f"Invalid parameter: {key}. Must be one of {PARAMETERS}.")
+
+        parameters[resource] = {}
+        for key in PARAMETERS:
+            distribution = resource_distributions.get(key)
+            if distribution is None:
+                values = np.full(n_draws, resource_dict[key], dtype=np.float64)
+            elif callable(distribution):
+                values = np.asarray(distribution(rng, n_draws), dtype=np.float64)
+            else:
+                name, *arguments = distribution
+                values = getattr(rng, name)(*arguments, size=n_draws).astype(np.float64)
+            parameters[resource][key] = values
+    return parameters
+
+
+def _evaluate_chunk(yearly_prod, expl_ratio, parameters, ratio_base, percentiles, dtype):
+    """
+    The EROI and net production percentiles of a chunk of years over every draw.
+    :param yearly_prod: The (years x resources) production of the chunk.
+    :param expl_ratio: The (years x resources) exploitation ratio of the chunk with "production", or the summed
+    production up to the previous year with "URR" (divided by the URR of each draw here).
+    :return: The (percentiles x years x resources) EROI percentiles, and the (percentiles x years x resources + 1) net
+    production percentiles, where the last column is the total over the resources.
+    """
+    # The constants of each draw are given a year axis so that they broadcast against the (years x resources) data.
+    resource_dicts = [{key: values[:, np.newaxis] for key, values in parameters[resource].items()}
+                      for resource in RESOURCES]
+    if ratio_base == "URR":
+        # Court and Fizaine's original definition, with the exploitation ratio taken against the URR of each draw.
+        expl_ratio = expl_ratio / np.stack([resource_dict["URR"] for resource_dict in resource_dicts], axis=-1)
+
+    # (draws x years x resources) arrays, which only exist for this chunk of years.
+    EROI = f.fossil_EROI_eq(expl_ratio, resource_dicts)
+    net_prod = yearly_prod * (1 - 1 / EROI)
+    net_total = net_prod.sum(axis=2)
+    EROI_percentiles = np.percentile(EROI.astype(dtype, copy=False), percentiles, axis=0)
+    net_total_percentiles = np.percentile(net_total.astype(dtype, copy=False), percentiles, axis=0)
+    net_percentiles = np.concatenate([np.percentile(net_prod.astype(dtype, copy=False), percentiles, axis=0),
+                                      net_total_percentiles[..., np.newaxis]], axis=2)
+    return EROI_percentiles, net_percentiles
+
+
+def monte_carlo_EROI(yearly_prod, distributions, n_draws=10000, percentiles=(5, 50, 95), seed=None, chunk_size=50,
+                     max_workers=1, ratio_base="production", dtype=np.float32):
+    """
+    The percentile bands of the EROI and net production per year when the Court and Fizaine constants are drawn from
+    distributions (see draw_parameters).
+    :param yearly_prod: The PER YEAR production for coal, gas, and oil (see gersdemo_prod_results).
+    :param distributions: The distribution of each varied constant per resource (see draw_parameters).
+    :param n_draws: The number of parameter sets.
+    :param percentiles: The percentiles to report per year.
+    :param seed: The seed of the random generator, for reproducible draws.
+    :param chunk_size: The number of years evaluated at once over every draw. Bounds the memory of the intermediate
+    arrays to about n_draws * chunk_size * 3 values each.
+    :param max_workers: The number of worker processes the chunks are spread over. With 1, everything runs in this process.
+    :param ratio_base: "production" for the adjusted exploitation ratio of the thesis (summed production over total
+    production), or "URR" for the exploitation ratio against the drawn URR. The URR draws are only used with "URR".
+    :param dtype: The dtype the EROI and net production of every draw are kept in while the percentiles are taken.
+    :return: EROI_bands - the Year and percentiles of the EROI per resource (i.e. "Coal EROI 5%");
+    net_prod_bands - the Year and percentiles of the net PER YEAR production per resource and in total (i.e. "Total Net Prod 95%").
+    """
+    if ratio_base not in ["production", "URR"]:
+        raise ValueError(f"Invalid ratio base: {ratio_base}. Must be one of ['production', 'URR'].")
+    prod = yearly_prod[[resource + " Prod" for resource in RESOURCES]].to_numpy(dtype=np.float64)
+    parameters = draw_parameters(distributions, n_draws, seed=seed)
+
+    # The exploitation ratio against production does not depend on the draws, so it is calculated once for all years.
+    sum_prod = np.cumsum(prod, axis=0)
+    if ratio_base == "production":
+        expl_ratio, _ = f.fossil_EROI_kernel(sum_prod)
+    else:
+        expl_ratio = np.zeros_like(sum_prod)
+        expl_ratio[1:] = sum_prod[:-1]
+
+    starts = range(0, len(prod), chunk_size)
+    arguments = ([prod[start:start + chunk_size] for start in starts],
+                 [expl_ratio[start:start + chunk_size] for start in starts],
+                 [parameters] * len(starts), [ratio_base] * len(starts), [percentiles] * len(starts),
+                 [dtype] * len(starts))
+    if max_workers <= 1:
+        results = list(map(_evaluate_chunk, *arguments))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(_evaluate_chunk, *arguments))
+
+    # (percentiles x years x resources) bands, where the net production also has a total over the resources.
+    EROI_percentiles = np.concatenate([chunk_EROI for chunk_EROI, _ in results], axis=1)
+    net_percentiles = np.concatenate([chunk_net_prod for _, chunk_net_prod in results], axis=1)
+
+    years = yearly_prod["Year"].to_numpy()
+    EROI_bands = pd.DataFrame({"Year": years})
+    net_prod_bands = pd.DataFrame({"Year": years})
+    for i, resource in enumerate(RESOURCES):
+        for j, percentile in enumerate(percentiles):
+            EROI_bands[f"{resource} EROI {percentile}%"] = EROI_percentiles[j, :, i].astype(np.float64)
+    for i, resource in enumerate(RESOURCES + ["Total"]):
+        for j, percentile in enumerate(percentiles):
+            net_prod_bands[f"{resource} Net Prod {percentile}%"] = net_percentiles[j, :, i].astype(np.float64)
+    return EROI_bands, net_prod_bands
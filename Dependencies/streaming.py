@@ -0,0 +1,147 @@
+# Streaming ingestion of GeRS-DeMo results for outputs too large to hold (together with their transpose) in memory. The
+# results sheet is read a chunk of rows at a time, either from the workbook through read-only openpyxl iteration or from
+# a CSV export, and only the per mineral yearly sums are kept. Everything else follows from those sums:
+#   - the SUMMED YEARS production is their cumulative sum, which gives the exploitation ratio and EROI, and
+#   - the net energy of a mineral in a year is the sum over its rows of production * (1 - 1/EROI), and since the
+#     multiplier is the same for every row of that mineral and year, it equals the yearly sum * (1 - 1/EROI).
+# So the cleaned frame is never built, and peak memory is bounded by chunk_size times the number of mines/fields.
+#
+# i.e.:
+#     results = stream_result_dataframes("Datasets/Dynamic_BG_results.xlsx", "Dynamic_BG", chunk_size=100)
+#     results["general_output"]
+
+# For reading CSV exports row by row.
+import csv
+# For general data preparation/wrangling.
+import pandas as pd
+# For the chunk sums.
+import numpy as np
+# For reading workbooks row by row.
+import openpyxl
+# General program functions
+from Dependencies import functions as f
+# For opt-in timings of each stage.
+from Dependencies.instrumentation import instrumented
+
+RESOURCES = ["Coal", "Gas", "Oil"]
+DEFAULT_CHUNK_SIZE = 64
+
+
+def iter_sheet_rows(loc, sheet_name=None):
+    """
+    The rows of a results sheet as it is laid out in the spreadsheet (metadata rows, then one row per year), read
+    without loading the workbook into memory.
+    :param loc: The location of the workbook in the files.
+    :param sheet_name: The name of the sheet. Defaults to the first sheet.
+    :return: A generator of row tuples, the first value being the row label (i.e. "mineral" or 1950).
+    """
+    workbook = openpyxl.load_workbook(loc, read_only=True, data_only=True)
+    try:
+        sheet = workbook[sheet_name] if sheet_name is not None else workbook.worksheets[0]
+        yield from sheet.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def iter_csv_rows(loc):
+    """
+    The rows of a CSV export of a results sheet, in the same layout as iter_sheet_rows.
+    :param loc: The location of the CSV in the files.
+    :return: A generator of row lists of strings.
+    """
+    with open(loc, newline="") as file:
+        yield from csv.reader(file)
+
+
+def _year(label):
+    """The year of a row label, or None for metadata and empty rows."""
+    try:
+        return int(float(label))
+    except (TypeError, ValueError):
+        return None
+
+
+def _chunk_values(chunk, n_columns):
+    """A chunk of year rows as a (rows x columns) float64 array, with empty and non-numeric cells as 0."""
+    # Rows read from a sheet may be cut short after their last filled cell.
+    chunk = [row + (None,) * (n_columns - len(row)) if len(row) < n_columns else row[:n_columns] for row in chunk]
+    try:
+        values = np.array(chunk, dtype=np.float64)
+    except ValueError:
+        # CSV cells are strings, and empty strings cannot be converted directly.
+        values = pd.to_numeric(pd.Series(np.array(chunk, dtype=object).ravel()), errors="coerce")
+        values = values.to_numpy(dtype=np.float64, copy=True).reshape(len(chunk), n_columns)
+    values[np.isnan(values)] = 0.0
+    return values
+
+
+@instrumented("stream_mineral_sums")
+def stream_mineral_sums(rows, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    The per mineral sums of every year of a results sheet, read a chunk of year rows at a time.
+    :param rows: The rows of the sheet (see iter_sheet_rows and iter_csv_rows).
+    :param chunk_size: The number of year rows held in memory at once.
+    :return: The years and a (3 x years) float64 array of coal, gas, and oil production.
+    """
+    indicator = None
+    years, sums, chunk = [], [], []
+    for row in rows:
+        if not row:
+            continue
+        year = _year(row[0])
+        if year is None:
+            # The mineral row is the only metadata needed. Each mine/field column adds to the sum of its mineral.
+            if row[0] == "mineral":
+                minerals = np.array([str(mineral) for mineral in row[1:]], dtype=object)
+                indicator = np.stack([minerals == resource for resource in RESOURCES], axis=1).astype(np.float64)
+            continue
+        if indicator is None:
+            raise ValueError("The results sheet has no mineral row before its first year.")
+
+        years.append(year)
+        chunk.append(tuple(row[1:]))
+        if len(chunk) == chunk_size:
+            sums.append(_chunk_values(chunk, len(indicator)) @ indicator)
+            chunk = []
+    if chunk:
+        sums.append(_chunk_values(chunk, len(indicator)) @ indicator)
+
+    if not years:
+        raise ValueError("The results sheet has no year rows.")
+    return years, np.concatenate(sums).T
+
+
+def stream_result_dataframes(loc, sheet_name=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    The production, EROI, and net energy results of a GeRS-DeMo output (see get_result_dataframes), calculated while
+    streaming the results sheet so that the cleaned frame is never held in memory.
+    :param loc: The location of the workbook or of a CSV export of the results sheet (.csv).
+    :param sheet_name: The name of the sheet in the workbook. Defaults to the first sheet, and is ignored for CSVs.
+    :param chunk_size: The number of year rows held in memory at once.
+    :return: A dictionary of the yearly_prod, sum_years_prod, exploitation_ratio, EROI, net_sum_years_prod, and
+    general_output dataframes, with the same columns as get_result_dataframes.
+    """
+    rows = iter_csv_rows(loc) if str(loc).lower().endswith(".csv") else iter_sheet_rows(loc, sheet_name)
+    years, mineral_totals = stream_mineral_sums(rows, chunk_size=chunk_size)
+
+    yearly_prod = f.mineral_totals_frame(years, mineral_totals, prod_type=" Prod")
+    sum_years_prod = f.mineral_totals_frame(years, np.cumsum(mineral_totals, axis=1), prod_type=" Sum Prod")
+    exploitation_ratio = f.exploitation_ratio_adjusted(sum_years_prod)
+    EROI = f.resource_fossil_EROI(exploitation_ratio)
+
+    # The EROI rows line up with the years, so the net energy multiplier 1 - 1/EROI applies to the sums directly. Years
+    # where a mineral's EROI is NA (i.e. a mineral without any production) give no net energy, as in
+    # gersdemo_prod_results, which skips NA values when summing.
+    with np.errstate(divide='ignore', invalid='ignore'):
+        net_totals = mineral_totals * (1 - 1 / EROI[[resource + " EROI" for resource in RESOURCES]].to_numpy().T)
+    net_totals[np.isnan(net_totals)] = 0.0
+    net_sum_years_prod = f.mineral_totals_frame(years, net_totals, prod_type=" Prod")
+
+    return {
+        "yearly_prod": yearly_prod,
+        "sum_years_prod": sum_years_prod,
+        "exploitation_ratio": exploitation_ratio,
+        "EROI": EROI,
+        "net_sum_years_prod": net_sum_years_prod,
+        "general_output": f._merge_general_output(yearly_prod, net_sum_years_prod, EROI)
+    }
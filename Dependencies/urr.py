@@ -0,0 +1,190 @@
+# URR (ultimately recoverable resources) of the mines and fields in the GeRS-DeMo input workbooks (Dynamic_*.xlsm). The
+# macro-enabled workbooks are slow to parse, so the Mine and Field sheets are read once into a typed table (categorical
+# text columns, nullable integer start years, float URR) that is stored in the on-disk cache (see cache.store_table) keyed
+# on the workbook contents. The URR aggregates used in preliminary_vis.ipynb (by continent, mineral, start year, and decade) are then
+# precomputed from that table, so queries do not go back to the deposits.
+#
+# i.e.:
+#     base_urr = URRIndex.from_workbook("Datasets/Dynamic_BG.xlsm")
+#     base_urr.query(continent="Africa", mineral="Oil", end_year=1999)
+#     base_urr.check_constants()
+
+# For the location of the workbook in the cache entries.
+import os
+# For general data preparation/wrangling.
+import pandas as pd
+# For the URR arrays.
+import numpy as np
+# For the constant URR of each resource.
+from Dependencies import constants as c
+# For storing the parsed deposits.
+from Dependencies import cache
+# For the readable continent names.
+from Dependencies.regional import continent_name, rename_continents
+# For opt-in timings of each stage.
+from Dependencies.instrumentation import instrumented
+
+DEPOSIT_SHEETS = ["Mine", "Field"]
+TEXT_COLUMNS = ["Continent", "Country", "Region", "Mineral", "type"]
+NUMERIC_COLUMNS = ["Start Year", "URR"]
+RESOURCES = ["Coal", "Gas", "Oil"]
+
+
+@instrumented("read_deposit_sheets")
+def _read_deposit_sheets(loc):
+    """Reads the Mine and Field sheets of an input workbook, keeping the columns used for URR."""
+    with pd.ExcelFile(loc) as workbook:
+        sheets = [pd.read_excel(workbook, sheet, usecols=TEXT_COLUMNS + NUMERIC_COLUMNS).assign(Deposit=sheet)
+                  for sheet in DEPOSIT_SHEETS]
+    deposits = pd.concat(sheets, ignore_index=True).dropna(subset=["Mineral", "URR"])
+    return deposits[["Deposit"] + TEXT_COLUMNS + NUMERIC_COLUMNS].reset_index(drop=True)
+
+
+def _typed_deposits(deposits):
+    """
+    The deposits with categorical text columns, integer start years, and float URR. Deposits without a start year are
+    kept, with an NA start year (nullable Int64), since their URR still counts towards every total.
+    """
+    deposits = deposits.astype({column: "category" for column in ["Deposit"] + TEXT_COLUMNS})
+    return deposits.astype({"Start Year": "Int64", "URR": np.float64})
+
+
+def read_deposits(loc, use_cache=True, cache_dir=cache.DEFAULT_CACHE_DIR, max_bytes=cache.DEFAULT_MAX_BYTES):
+    """
+    Reads the mines and fields of a GeRS-DeMo input workbook, going through the on-disk cache so that each workbook is
+    only parsed once.
+    :param loc: The location of the input workbook in the files (i.e. Datasets/Dynamic_BG.xlsm).
+    :param use_cache: Indicates whether the cache should be used. If False, the workbook is always parsed.
+    :param cache_dir: The directory holding the cache entries.
+    :param max_bytes: The maximum total size of the cache.
+    :return: A pandas dataframe with one row per mine/field, and the Deposit ("Mine" or "Field"), Continent, Country,
+    Region, Mineral, type, Start Year (NA if blank), and URR columns.
+    """
+    if not use_cache:
+        return _typed_deposits(_read_deposit_sheets(loc))
+
+    content_hash = cache.workbook_hash(loc)
+    key = cache.cache_key(content_hash, "+".join(DEPOSIT_SHEETS), columns=TEXT_COLUMNS + NUMERIC_COLUMNS)
+    deposits = cache.load_table(key, cache_dir=cache_dir)
+    if deposits is None:
+        deposits = _typed_deposits(_read_deposit_sheets(loc))
+        cache.store_table(key, deposits, cache_dir=cache_dir, max_bytes=max_bytes, loc=os.path.abspath(loc),
+                          sheet="+".join(DEPOSIT_SHEETS), hash=content_hash)
+    return deposits
+
+
+def check_urr_constants(urr_by_mineral, tolerance=0.1):
+    """
+    Compares the URR of each resource with the URR of Court and Fizaine in constants.py.
+    :param urr_by_mineral: A pandas series of URR per mineral.
+    :param tolerance: The relative difference still counted as matching.
+    :return: A pandas dataframe with the Mineral, "URR" (from the dataset), "Constant URR", "Difference", "Ratio", and
+    "Within Tolerance" columns.
+    """
+    urr = urr_by_mineral.reindex(RESOURCES, fill_value=0.0).to_numpy(dtype=np.float64)
+    constant_urr = np.array([getattr(c, resource)["URR"] for resource in RESOURCES], dtype=np.float64)
+    ratio = urr / constant_urr
+    return pd.DataFrame({
+        "Mineral": RESOURCES,
+        "URR": urr,
+        "Constant URR": constant_urr,
+        "Difference": urr - constant_urr,
+        "Ratio": ratio,
+        "Within Tolerance": np.abs(ratio - 1) <= tolerance
+    })
+
+
+class URRIndex:
+    """
+    The URR aggregates of an input workbook, precomputed once from its mines and fields.
+    """
+
+    def __init__(self, deposits, rename=True):
+        """
+        :param deposits: The mines and fields of a workbook (see read_deposits).
+        :param rename: Indicates whether the continents of by_continent should use their readable names (see
+        regional.CONTINENT_NAMES). As in preliminary_vis.ipynb, the deposits and the other aggregates keep the
+        GeRS-DeMo names.
+        """
+        self.deposits = deposits
+
+        # The finest aggregate, which every other aggregate and query is summed from. Deposits without a start year keep
+        # their own NA group here, so they only drop out of the year and decade aggregates.
+        self.by_start_year = (deposits.groupby(["Deposit", "Continent", "Mineral", "Start Year"], observed=True,
+                                               dropna=False, as_index=False)["URR"].sum())
+        self.by_start_year["Decade"] = (self.by_start_year["Start Year"] // 10) * 10
+        self.by_continent = (self.by_start_year.groupby(["Continent", "Mineral"], observed=True, as_index=False)["URR"]
+                             .sum())
+        if rename:
+            self.by_continent = rename_continents(self.by_continent, column="Continent")
+        self.by_year = self.by_start_year.groupby(["Start Year"], as_index=False)["URR"].sum()
+        self.by_year["Decade"] = (self.by_year["Start Year"] // 10) * 10
+        self.by_decade = self.by_year.groupby("Decade", as_index=False)["URR"].sum()
+        self.by_mineral = self.by_start_year.groupby("Mineral", observed=True)["URR"].sum()
+        self.by_country = (deposits.groupby(["Country", "Mineral"], observed=True, as_index=False)["URR"].sum()
+                           .sort_values(by="URR", ascending=False))
+        self.total = float(deposits["URR"].sum())
+
+    @classmethod
+    def from_workbook(cls, loc, rename=True, use_cache=True, cache_dir=cache.DEFAULT_CACHE_DIR,
+                      max_bytes=cache.DEFAULT_MAX_BYTES):
+        """
+        The URR index of an input workbook.
+        :param loc: The location of the input workbook in the files (i.e. Datasets/Dynamic_BG.xlsm).
+        :param rename: Indicates whether the continents of by_continent should use their readable names.
+        :param use_cache: Indicates whether the cache should be used (see read_deposits).
+        :param cache_dir: The directory holding the cache entries.
+        :param max_bytes: The maximum total size of the cache.
+        :return: The URRIndex.
+        """
+        return cls(read_deposits(loc, use_cache=use_cache, cache_dir=cache_dir, max_bytes=max_bytes), rename=rename)
+
+    def query(self, continent=None, mineral=None, start_year=None, end_year=None, deposit=None, by=None):
+        """
+        The URR of the mines/fields matching every given filter.
+        :param continent: A continent or list of continents, by their GeRS-DeMo or readable names.
+        :param mineral: A mineral or list of minerals.
+        :param start_year: The first start year included. Deposits without a start year are then excluded.
+        :param end_year: The last start year included. Deposits without a start year are then excluded.
+        :param deposit: "Mine" or "Field".
+        :param by: A column or list of columns (Deposit, Continent, Mineral, Start Year, or Decade) to group the URR by.
+        :return: The total URR, or a pandas series of URR per group if by is given.
+        """
+        selected = self.by_start_year
+        mask = np.ones(len(selected), dtype=bool)
+        if continent is not None:
+            continents = [continent_name(value) for value in ([continent] if isinstance(continent, str) else continent)]
+            mask &= selected["Continent"].map(continent_name).isin(continents).to_numpy()
+        for column, value in [("Mineral", mineral), ("Deposit", deposit)]:
+            if value is not None:
+                mask &= selected[column].isin([value] if isinstance(value, str) else value).to_numpy()
+        if start_year is not None:
+            mask &= (selected["Start Year"] >= start_year).to_numpy(dtype=bool, na_value=False)
+        if end_year is not None:
+            mask &= (selected["Start Year"] <= end_year).to_numpy(dtype=bool, na_value=False)
+        selected = selected[mask]
+        if by is None:
+            return float(selected["URR"].sum())
+        return selected.groupby(by, observed=True)["URR"].sum()
+
+    def check_constants(self, tolerance=0.1):
+        """The URR of each resource compared with constants.py (see check_urr_constants)."""
+        return check_urr_constants(self.by_mineral, tolerance=tolerance)
+
+    def scenario(self):
+        """
+        The URR frames of preliminary_vis.ipynb.
+        :return: A dictionary of urr_mines and urr_fields (continent/mineral/start year), urr_all (continent/mineral),
+        prod_year and prod_decade (URR by start year and decade), urr_all_country (country/mineral), and total_urr.
+        Deposits without a start year are only left out of prod_year and prod_decade.
+        """
+        by_start_year = self.by_start_year.drop(columns="Decade")
+        return {
+            'urr_mines': by_start_year[by_start_year["Deposit"] == "Mine"].drop(columns="Deposit").reset_index(drop=True),
+            'urr_fields': by_start_year[by_start_year["Deposit"] == "Field"].drop(columns="Deposit").reset_index(drop=True),
+            'urr_all': self.by_continent,
+            'prod_year': self.by_year,
+            'prod_decade': self.by_decade,
+            'urr_all_country': self.by_country,
+            'total_urr': self.total
+        }
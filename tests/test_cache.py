@@ -0,0 +1,99 @@
+# The on-disk cache of cleaned result workbooks (see cache.py), stored in a temporary directory.
+
+# For the entry directories and their last use.
+import os
+# For general data preparation/wrangling.
+import pandas as pd
+# For the year blocks.
+import numpy as np
+# General program functions
+from Dependencies import functions as f
+from Dependencies import cache
+from tests.test_parity import workbook_loc
+
+SHEET_NAME = "Dynamic_BG"
+
+
+def small_frame(seed):
+    """A cleaned frame with two metadata columns and ten years."""
+    rng = np.random.default_rng(seed)
+    metadata = pd.DataFrame({"continent": ["Africa", "Asia", "Europe"], "mineral": ["Coal", "Gas", "Oil"]})
+    return pd.concat([metadata, pd.DataFrame(rng.random((3, 10)), columns=range(2000, 2010))], axis=1)
+
+
+def store(cache_dir, name, last_used=None, **info):
+    """Stores a small frame under the key of name, optionally marking when it was last used."""
+    key = cache.cache_key(name, name)
+    cache.store_frame(key, small_frame(len(name)), 2, cache_dir=cache_dir, max_bytes=None, **info)
+    if last_used is not None:
+        os.utime(os.path.join(cache_dir, key, cache._ENTRY_FILE), (last_used, last_used))
+    return key
+
+
+def test_cache_miss_and_hit_give_the_same_frame(tmp_path):
+    missed = f.read_gersdemo_results(workbook_loc(SHEET_NAME), SHEET_NAME, cache_dir=tmp_path)
+    hit = f.read_gersdemo_results(workbook_loc(SHEET_NAME), SHEET_NAME, cache_dir=tmp_path)
+
+    pd.testing.assert_frame_equal(missed, hit)
+    assert missed.columns.name == hit.columns.name
+    assert missed.to_csv() == hit.to_csv()
+
+
+def test_store_and_load_frame(tmp_path):
+    key = store(tmp_path, "a")
+    pd.testing.assert_frame_equal(cache.load_frame(key, cache_dir=tmp_path), small_frame(1), check_dtype=False)
+    assert cache.load_frame(cache.cache_key("b", "b"), cache_dir=tmp_path) is None
+
+
+def test_evict_removes_the_least_recently_used_entries(tmp_path):
+    keys = [store(tmp_path, name, last_used=1000 + i) for i, name in enumerate(["a", "b", "c"])]
+    entry_size = cache.list_entries(tmp_path)[0]["size"]
+    # A file that is not an entry is never removed.
+    (tmp_path / "notes.txt").write_text("not an entry")
+
+    assert cache.evict(2 * entry_size, cache_dir=tmp_path) == 1
+    assert sorted(entry["key"] for entry in cache.list_entries(tmp_path)) == sorted(keys[1:])
+    assert cache.load_frame(keys[0], cache_dir=tmp_path) is None
+
+    # Loading an entry marks it as used, so the other one is removed next.
+    cache.load_frame(keys[1], cache_dir=tmp_path)
+    assert cache.evict(entry_size, cache_dir=tmp_path) == 1
+    assert [entry["key"] for entry in cache.list_entries(tmp_path)] == [keys[1]]
+    assert (tmp_path / "notes.txt").exists()
+
+
+def test_evict_keeps_the_given_keys(tmp_path):
+    keys = [store(tmp_path, name, last_used=1000 + i) for i, name in enumerate(["a", "b"])]
+    assert cache.evict(0, cache_dir=tmp_path, keep=[keys[0]]) == 1
+    assert [entry["key"] for entry in cache.list_entries(tmp_path)] == [keys[0]]
+    assert cache.evict(0, cache_dir=tmp_path / "missing") == 0
+
+
+def test_store_frame_evicts_past_max_bytes(tmp_path):
+    old_key = store(tmp_path, "a", last_used=1000)
+    entry_size = cache.list_entries(tmp_path)[0]["size"]
+    new_key = cache.cache_key("b", "b")
+    cache.store_frame(new_key, small_frame(0), 2, cache_dir=tmp_path, max_bytes=entry_size)
+    assert [entry["key"] for entry in cache.list_entries(tmp_path)] == [new_key]
+    assert cache.load_frame(old_key, cache_dir=tmp_path) is None
+
+
+def test_invalidate(tmp_path):
+    cache_dir = tmp_path / "cache"
+    workbook = tmp_path / "Dynamic_Test_results.xlsx"
+    workbook.write_bytes(b"workbook contents")
+    moved = tmp_path / "Moved_results.xlsx"
+    moved.write_bytes(b"workbook contents")
+    content_hash = cache.workbook_hash(workbook)
+
+    store(cache_dir, "a", loc=os.path.abspath(workbook), sheet="Dynamic_Test", hash=content_hash)
+    store(cache_dir, "b", loc=os.path.abspath(workbook), sheet="Other", hash=content_hash)
+    other_key = store(cache_dir, "c", loc="elsewhere.xlsx", sheet="Dynamic_Test", hash="other")
+
+    assert cache.invalidate(workbook, sheet_name="Dynamic_Test", cache_dir=cache_dir) == 1
+    # Entries of the same contents are matched from another location as well.
+    assert cache.invalidate(moved, cache_dir=cache_dir) == 1
+    assert [entry["key"] for entry in cache.list_entries(cache_dir)] == [other_key]
+    assert cache.invalidate(cache_dir=cache_dir) == 1
+    assert cache.list_entries(cache_dir) == []
+    assert workbook.exists() and moved.exists()
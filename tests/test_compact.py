@@ -0,0 +1,61 @@
+# Compact cleaned datasets (see compact.py) against the dataframe results of the bundled scenarios. float64 compact
+# results must match the dataframes, and float32 ones must stay within the error bound derived in compact.py.
+
+# For the year blocks.
+import numpy as np
+import pytest
+# General program functions
+from Dependencies import functions as f
+from Dependencies.compact import CompactResults, FLOAT32_RELATIVE_ERROR
+from tests.test_parity import SCENARIOS, workbook_loc
+
+# The relative error bound of each float32 result, in units of FLOAT32_RELATIVE_ERROR: production and its sums carry a
+# single rounding, the exploitation ratio is a ratio of two of those sums, the EROI moves by far less, and net energy is
+# rounded again when stored (past two roundings for the mines/fields of years with an EROI close to 1).
+FLOAT32_BOUNDS = {"yearly_prod": 1, "sum_years_prod": 1, "exploitation_ratio": 2, "EROI": 1, "net_yearly_prod": 3,
+                  "net_sum_years_prod": 2.5, "general_output": 2.5}
+
+
+def assert_within(actual, expected, rtol):
+    """Asserts that every value is within rtol of the expected value, relative to that value."""
+    actual, expected = np.asarray(actual, dtype=np.float64), np.asarray(expected, dtype=np.float64)
+    np.testing.assert_array_equal(np.isnan(actual), np.isnan(expected))
+    np.testing.assert_array_less(np.abs(np.nan_to_num(actual - expected)),
+                                 rtol * np.abs(np.nan_to_num(expected)) + np.finfo(np.float64).tiny)
+
+
+@pytest.fixture(scope="module", params=[sheet_name for _, sheet_name in SCENARIOS])
+def scenario(request):
+    loc = workbook_loc(request.param)
+    return tuple(f.get_result_dataframes(loc, request.param, compact=compact)
+                 for compact in [None, np.float64, np.float32])
+
+
+def year_block(result):
+    """The year block of a cleaned dataset, or the numeric columns of a per year result."""
+    if isinstance(result, CompactResults):
+        return result.values
+    first_col_index, _ = f.gersdemo_year_columns(result)
+    return result.iloc[:, first_col_index:].to_numpy(dtype=np.float64) if "Year" not in result else result.to_numpy()
+
+
+@pytest.mark.parametrize("name", FLOAT32_BOUNDS)
+def test_float64_compact_matches_frames(scenario, name):
+    frames, compact, _ = scenario
+    np.testing.assert_allclose(year_block(compact.get(name)), year_block(frames.get(name)), rtol=1e-12, atol=0)
+
+
+@pytest.mark.parametrize("name", FLOAT32_BOUNDS)
+def test_float32_compact_within_error_bound(scenario, name):
+    frames, _, compact = scenario
+    assert_within(year_block(compact.get(name)), year_block(frames.get(name)),
+                  FLOAT32_BOUNDS[name] * FLOAT32_RELATIVE_ERROR)
+
+
+def test_compact_metadata_matches_frames(scenario):
+    frames, _, compact = scenario
+    assert compact.cleaned_output.values.dtype == np.float32
+    first_col_index, years = f.gersdemo_year_columns(frames.cleaned_output)
+    assert list(compact.cleaned_output.years) == list(years)
+    np.testing.assert_array_equal(compact.cleaned_output.metadata.astype(str).to_numpy(),
+                                  frames.cleaned_output.iloc[:, :first_col_index].astype(str).to_numpy())
@@ -0,0 +1,29 @@
+# The run report of instrumented stages (see instrumentation.py).
+
+import pytest
+# For the summary table.
+import pandas as pd
+# Opt-in instrumentation of the EROI pipeline
+from Dependencies.instrumentation import collect, instrumented
+
+
+@instrumented("test_inner")
+def inner(n):
+    return pd.DataFrame({"values": range(n)})
+
+
+@instrumented("test_outer")
+def outer(n):
+    return pd.concat([inner(n), inner(n)], ignore_index=True)
+
+
+@pytest.mark.parametrize("memory", [False, True])
+def test_summary(memory):
+    with collect(memory=memory) as report:
+        outer(1000)
+    summary = report.summary().set_index("stage")
+
+    assert summary.loc["test_inner", "calls"] == 2 and summary.loc["test_outer", "calls"] == 1
+    assert summary.loc["test_outer", "self_duration"] <= summary.loc["test_outer", "total_duration"]
+    # Memory changes are only reported when they were measured.
+    assert summary["memory_delta"].isna().all() != memory
@@ -0,0 +1,31 @@
+# Parity of the EROI pipeline with the thesis outputs in Outputs/Tables/*General.csv, for the three bundled scenarios.
+
+# For the locations of the workbooks and tables.
+import os
+# For general data preparation/wrangling.
+import pandas as pd
+# For the comparisons.
+import numpy as np
+import pytest
+# General program functions
+from Dependencies import functions as f
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# (table name, sheet name) of each scenario.
+SCENARIOS = [("Base", "Dynamic_BG"), ("high", "Dynamic_High"), ("low", "Dynamic_Low")]
+
+
+def workbook_loc(sheet_name):
+    """The location of a bundled results workbook."""
+    return os.path.join(ROOT, "Datasets", sheet_name + "_results.xlsx")
+
+
+@pytest.mark.parametrize("table_name, sheet_name", SCENARIOS)
+def test_general_output_matches_tables(table_name, sheet_name):
+    expected = pd.read_csv(os.path.join(ROOT, "Outputs", "Tables", table_name + "General.csv"), index_col=0)
+    general_output = f.get_result_dataframes(workbook_loc(sheet_name), sheet_name).general_output
+
+    assert list(general_output.columns) == list(expected.columns)
+    np.testing.assert_array_equal(general_output["Year"].to_numpy(), expected["Year"].to_numpy())
+    np.testing.assert_allclose(general_output.drop(columns="Year").to_numpy(dtype=np.float64),
+                               expected.drop(columns="Year").to_numpy(dtype=np.float64), rtol=1e-9, atol=1e-9)
@@ -0,0 +1,124 @@
+# ResultDataframes.refresh after edits to a copy of a bundled workbook: the refreshed results must equal a fresh
+# calculation of the edited workbook.
+
+# For copying the bundled workbook.
+import shutil
+# For general data preparation/wrangling.
+import pandas as pd
+# For editing the copied workbook.
+import openpyxl
+import pytest
+# General program functions
+from Dependencies import functions as f
+# The Court and Fizaine constants
+from Dependencies import constants as c
+from tests.test_parity import workbook_loc
+
+SHEET_NAME = "Dynamic_BG"
+# The first year row of the sheet, after the eight metadata rows.
+FIRST_YEAR_ROW = 9
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    loc = tmp_path / "Dynamic_BG_results.xlsx"
+    shutil.copy(workbook_loc(SHEET_NAME), loc)
+    return str(loc)
+
+
+def edit_workbook(loc, edit):
+    """Applies edit to the results sheet of the workbook and saves it."""
+    book = openpyxl.load_workbook(loc)
+    edit(book[SHEET_NAME])
+    book.save(loc)
+
+
+def add_year(sheet):
+    """Adds one more year row, repeating the production of the last year."""
+    last_row = sheet.max_row
+    sheet.cell(row=last_row + 1, column=1).value = sheet.cell(row=last_row, column=1).value + 1
+    for column in range(2, sheet.max_column + 1):
+        sheet.cell(row=last_row + 1, column=column).value = sheet.cell(row=last_row, column=column).value
+
+
+def edit_first_coal(sheet):
+    """Adds production to a single year of the first mine, which is a coal mine."""
+    assert sheet.cell(row=5, column=2).value == "Coal"
+    sheet.cell(row=300, column=2).value = (sheet.cell(row=300, column=2).value or 0) + 5.0
+
+
+def zero_oil(sheet):
+    """Removes all oil production, which makes the oil EROI NA."""
+    oil_columns = [column for column in range(2, sheet.max_column + 1) if sheet.cell(row=5, column=column).value == "Oil"]
+    for row in range(FIRST_YEAR_ROW, sheet.max_row + 1):
+        for column in oil_columns:
+            if sheet.cell(row=row, column=column).value is not None:
+                sheet.cell(row=row, column=column).value = 0.0
+
+
+def assert_same_results(results, expected):
+    for name in ["yearly_prod", "sum_years_prod", "exploitation_ratio", "EROI", "net_sum_years_prod", "general_output"]:
+        pd.testing.assert_frame_equal(results.get(name), expected.get(name), check_exact=False, rtol=1e-12, atol=1e-12)
+
+
+@pytest.mark.parametrize("track_changes", [False, True])
+def test_refresh_after_adding_a_year(workbook, tmp_path, track_changes):
+    results = f.get_result_dataframes(workbook, SHEET_NAME, use_cache=True, cache_dir=tmp_path / "cache",
+                                      track_changes=track_changes)
+    list(results)
+    edit_workbook(workbook, add_year)
+
+    assert ("EROI", "all") in results.refresh()
+    assert_same_results(results, f.get_result_dataframes(workbook, SHEET_NAME))
+
+
+def test_refresh_only_recalculates_the_edited_resource(workbook, tmp_path):
+    results = f.get_result_dataframes(workbook, SHEET_NAME, use_cache=True, cache_dir=tmp_path / "cache",
+                                      track_changes=True)
+    list(results)
+    edit_workbook(workbook, edit_first_coal)
+
+    recalculated = results.refresh()
+    assert ("EROI", "Coal") in recalculated
+    assert not [pair for pair in recalculated if pair[1] in ("Gas", "Oil")]
+    assert_same_results(results, f.get_result_dataframes(workbook, SHEET_NAME))
+
+
+def test_refresh_of_a_resource_without_production(workbook, tmp_path):
+    results = f.get_result_dataframes(workbook, SHEET_NAME, use_cache=True, cache_dir=tmp_path / "cache",
+                                      track_changes=True)
+    list(results)
+    edit_workbook(workbook, zero_oil)
+
+    assert ("net_sum_years_prod", "Oil") in results.refresh()
+    assert not results.net_sum_years_prod["Oil Prod"].isna().any()
+    assert_same_results(results, f.get_result_dataframes(workbook, SHEET_NAME))
+
+
+@pytest.mark.parametrize("name", ["yearly_prod", "sum_years_prod", "net_sum_years_prod", "general_output"])
+def test_refresh_with_dropped_intermediates(workbook, tmp_path, name):
+    results = f.get_result_dataframes(workbook, SHEET_NAME, use_cache=True, cache_dir=tmp_path / "cache",
+                                      drop_intermediates=True, track_changes=True)
+    results.get(name)
+    assert results.refresh() == []
+
+    edit_workbook(workbook, edit_first_coal)
+    recalculated = {resource for result, resource in results.refresh() if result == name}
+    assert recalculated and recalculated <= {"all", "Coal"}
+    pd.testing.assert_frame_equal(results.get(name), f.get_result_dataframes(workbook, SHEET_NAME).get(name),
+                                  check_exact=False, rtol=1e-12, atol=1e-12)
+
+
+def test_refresh_ignores_constants_the_EROI_does_not_read(workbook, tmp_path, monkeypatch):
+    results = f.get_result_dataframes(workbook, SHEET_NAME, use_cache=True, cache_dir=tmp_path / "cache",
+                                      track_changes=True)
+    list(results)
+    monkeypatch.setitem(c.Gas, "URR", c.Gas["URR"] * 2)
+    monkeypatch.setitem(c.Gas["delta"], "b", c.Gas["delta"]["b"] * 2)
+    assert results.refresh() == []
+
+    monkeypatch.setitem(c.Gas, "rd", c.Gas["rd"] * 2)
+    recalculated = results.refresh()
+    assert ("EROI", "Gas") in recalculated
+    assert not [pair for pair in recalculated if pair[1] in ("Coal", "Oil")]
+    assert_same_results(results, f.get_result_dataframes(workbook, SHEET_NAME))
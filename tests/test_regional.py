@@ -0,0 +1,24 @@
+# Regional breakdowns of a bundled workbook: the superregions (from the country to superregion mapping, falling back to
+# the continent) must use the same names as the continents.
+
+import pytest
+# General program functions
+from Dependencies import functions as f
+# Regional breakdowns of the results
+from Dependencies import regional
+from tests.test_parity import workbook_loc
+
+SHEET_NAME = "Dynamic_BG"
+
+
+@pytest.fixture(scope="module")
+def results():
+    return f.get_result_dataframes(workbook_loc(SHEET_NAME), SHEET_NAME)
+
+
+@pytest.mark.parametrize("rename", [False, True])
+def test_superregions_match_continents(results, rename):
+    superregions = regional.regional_breakdown(results.cleaned_output, results.EROI, group_by="superregion",
+                                               rename=rename)
+    continents = regional.regional_breakdown(results.cleaned_output, results.EROI, group_by="continent", rename=rename)
+    assert sorted(superregions["superregion"].unique()) == sorted(continents["continent"].unique())
@@ -0,0 +1,27 @@
+# Batches of scenarios run across a process pool (see scenarios.py), against get_result_dataframes of each workbook.
+
+# For general data preparation/wrangling.
+import pandas as pd
+import pytest
+# General program functions
+from Dependencies import functions as f
+# Batches of scenarios
+from Dependencies import scenarios
+from tests.test_parity import workbook_loc
+
+SHEET_NAMES = ["Dynamic_BG", "Dynamic_Low"]
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_run_scenarios(tmp_path, max_workers):
+    specs = [(workbook_loc(sheet_name), sheet_name) for sheet_name in SHEET_NAMES]
+    specs.append(("Missing", str(tmp_path / "Missing_results.xlsx"), "Missing"))
+    results, failures, timings = scenarios.run_scenarios(specs, max_workers=max_workers, cache_dir=tmp_path / "cache")
+
+    assert sorted(results) == sorted(timings) == SHEET_NAMES
+    assert list(failures) == ["Missing"]
+    for sheet_name in SHEET_NAMES:
+        expected = f.get_result_dataframes(workbook_loc(sheet_name), sheet_name, use_cache=True,
+                                           cache_dir=tmp_path / "expected")
+        for name in f.ResultDataframes.OUTPUTS:
+            pd.testing.assert_frame_equal(results[sheet_name].get(name), expected.get(name))
@@ -0,0 +1,17 @@
+# Parameter draws of the Monte Carlo sensitivity bands (see sensitivity.py).
+
+import pytest
+# Monte Carlo sensitivity of the EROI
+from Dependencies import sensitivity
+
+
+@pytest.mark.parametrize("distributions", [{"gas": {"rd": ("normal", 4.98, 0.3)}}, {"Gas": {"RD": ("normal", 4.98, 0.3)}}])
+def test_invalid_distributions_are_rejected(distributions):
+    with pytest.raises(ValueError):
+        sensitivity.draw_parameters(distributions, 10, seed=0)
+
+
+def test_drawn_constants_vary_only_where_given():
+    parameters = sensitivity.draw_parameters({"Gas": {"rd": ("normal", 4.98, 0.3)}}, 10, seed=0)
+    assert parameters["Gas"]["rd"].std() > 0
+    assert parameters["Gas"]["sf"].std() == parameters["Oil"]["rd"].std() == 0
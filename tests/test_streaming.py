@@ -0,0 +1,41 @@
+# Streaming ingestion (see streaming.py) against the in-memory results of the bundled scenarios, for both the workbook
+# and a CSV export of its results sheet.
+
+# For writing the CSV export.
+import csv
+# For general data preparation/wrangling.
+import pandas as pd
+import pytest
+# General program functions
+from Dependencies import functions as f
+# Streaming ingestion of results sheets
+from Dependencies import streaming
+from tests.test_parity import SCENARIOS, workbook_loc
+
+RESULTS = ["yearly_prod", "sum_years_prod", "exploitation_ratio", "EROI", "net_sum_years_prod", "general_output"]
+
+
+@pytest.fixture(scope="module", params=[sheet_name for _, sheet_name in SCENARIOS])
+def scenario(request):
+    return request.param, f.get_result_dataframes(workbook_loc(request.param), request.param)
+
+
+def csv_export(sheet_name, loc):
+    """Writes the results sheet of a bundled workbook to a CSV, with empty cells as empty strings."""
+    with open(loc, "w", newline="") as file:
+        writer = csv.writer(file)
+        for row in streaming.iter_sheet_rows(workbook_loc(sheet_name), sheet_name):
+            writer.writerow(["" if value is None else value for value in row])
+    return loc
+
+
+@pytest.mark.parametrize("source", ["xlsx", "csv"])
+@pytest.mark.parametrize("chunk_size", [1, 64, 10000])
+def test_streaming_matches_in_memory_results(scenario, tmp_path, source, chunk_size):
+    sheet_name, expected = scenario
+    loc = workbook_loc(sheet_name) if source == "xlsx" else csv_export(sheet_name, str(tmp_path / "results.csv"))
+    streamed = streaming.stream_result_dataframes(loc, sheet_name, chunk_size=chunk_size)
+
+    for name in RESULTS:
+        pd.testing.assert_frame_equal(streamed[name], expected.get(name), check_dtype=False, check_exact=False,
+                                      rtol=1e-12, atol=1e-12)
@@ -0,0 +1,43 @@
+# URR of the mines and fields of an input workbook, read through the on-disk cache, for deposits with and without a
+# start year.
+
+# For general data preparation/wrangling.
+import pandas as pd
+# URR aggregates of the input workbooks
+from Dependencies import urr
+
+
+def write_deposits(loc):
+    """Writes a small input workbook with one Mine and one Field sheet, and a mine without a start year."""
+    mines = pd.DataFrame({"Continent": ["Africa", "FSU", "FSU"], "Country": ["Algeria", "Russia", "Russia"],
+                          "Region": ["all", "all", "all"], "Mineral": ["Coal", "Coal", "Gas"],
+                          "type": ["Black", "Brown", "Conventional"], "Start Year": [1950, None, 1962],
+                          "URR": [10.0, 5.0, 2.0]})
+    fields = pd.DataFrame({"Continent": ["Middle_East"], "Country": ["Iran"], "Region": ["all"], "Mineral": ["Oil"],
+                           "type": ["Conventional"], "Start Year": [1958], "URR": [7.0]})
+    with pd.ExcelWriter(loc) as writer:
+        mines.to_excel(writer, sheet_name="Mine", index=False)
+        fields.to_excel(writer, sheet_name="Field", index=False)
+
+
+def test_deposits_without_a_start_year(tmp_path):
+    loc = str(tmp_path / "Dynamic_Test.xlsx")
+    write_deposits(loc)
+    cache_dir = tmp_path / "cache"
+
+    deposits = urr.read_deposits(loc, cache_dir=cache_dir)
+    assert deposits["Start Year"].isna().sum() == 1
+    pd.testing.assert_frame_equal(urr.read_deposits(loc, cache_dir=cache_dir), deposits)
+    pd.testing.assert_frame_equal(urr.read_deposits(loc, use_cache=False), deposits)
+
+    urr_index = urr.URRIndex(deposits)
+    assert urr_index.total == urr_index.query() == 24.0
+    assert urr_index.by_mineral["Coal"] == 15.0
+    assert urr_index.query(mineral="Coal", end_year=2000) == 10.0
+    assert urr_index.query(continent="Middle East") == urr_index.query(continent="Middle_East") == 7.0
+    assert urr_index.by_year["URR"].sum() == 19.0
+    assert urr_index.by_decade["Decade"].tolist() == [1950, 1960]
+
+    scenario = urr_index.scenario()
+    assert "Former Soviet Union" in scenario["urr_all"]["Continent"].tolist()
+    assert "FSU" in scenario["urr_mines"]["Continent"].tolist()